@@ -1,7 +1,10 @@
 import logging
+import re
 import time
 import os
+from collections import Counter
 from transformers import pipeline
+from onnx_backend import load_quantized, resolve_device
 
 logger = logging.getLogger("CategorizerManager")
 logger.setLevel(logging.INFO)
@@ -10,22 +13,90 @@ formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
 ch.setFormatter(formatter)
 logger.addHandler(ch)
 
+# начала слов, по которым дешёвая стадия каскада узнаёт категорию; многозначные начала
+# («премьер» из «премьер-министр», «акци», «сборн», «чип») сюда не ставим
+KEYWORDS = {
+    "политика": ("президент", "госдум", "парламент", "депутат", "санкци", "дипломат", "кремл",
+                 "переговор", "саммит", "оппозиц", "посольств"),
+    "экономика": ("рубл", "доллар", "инфляц", "нефт", "бирж", "акционер", "дивиденд", "экономик",
+                  "бюджет", "налог", "кредит", "ипотек", "центробанк", "выручк", "инвест"),
+    "общество": ("школ", "пенси", "жител", "горожан", "семья", "семьи", "семей", "социальн", "образовани", "студент",
+                 "волонт", "многодетн"),
+    "технологии": ("смартфон", "нейросет", "искусственн", "приложени", "процессор", "кибер", "хакер",
+                   "интернет", "стартап", "apple", "google", "яндекс", "софт", "микросхем"),
+    "спорт": ("матч", "чемпионат", "турнир", "футбол", "хокке", "баскетбол", "теннис", "голкипер", "нападающ",
+              "олимпи", "тренер", "спортсмен"),
+    "культура": ("фильм", "кино", "театр", "музе", "выставк", "концерт", "режиссер", "режиссёр", "актер",
+                 "актёр", "писател", "книг", "фестивал", "спектакл"),
+    "наука": ("ученые", "учёные", "ученых", "учёных", "исследовани", "космическ", "телескоп", "эксперимент", "физик",
+              "биолог", "генетик", "молекул", "астроном", "археолог"),
+    "происшествия": ("пожар", "погиб", "пострада", "авари", "задержан", "убийств", "полици",
+                     "взрыв", "уголовн", "спасател", "крушени", "наводнени"),
+}
+
+# слова, которые засчитываются только целиком: аббревиатуры и формы, начало которых многозначно
+KEYWORD_TOKENS = {
+    "политика": ("нато", "выборы", "выборов", "выборах", "посол", "посла", "послом"),
+    "экономика": ("ввп", "цб"),
+    "общество": ("жкх",),
+    "технологии": ("чип", "чипы", "чипов"),
+    "спорт": ("сборная", "сборной", "сборную", "кхл", "рпл", "нхл", "фифа", "уефа"),
+    "происшествия": ("дтп", "мчс"),
+}
+
+
+def keyword_hits(text: str) -> Counter:
+    words = re.findall(r"\w+", text.lower())
+    return Counter({
+        label: sum(word.startswith(stems) or word in KEYWORD_TOKENS.get(label, ()) for word in words)
+        for label, stems in KEYWORDS.items()
+    })
+
+
+def keyword_scores(text: str, categories: list, prior: dict = None, threshold=0.7, min_keyword_hits=2,
+                   prior_strength=3.0):
+    """Доли категорий по ключевым словам (с априорным распределением источника) или None,
+    если совпадений меньше min_keyword_hits либо уверенность ниже threshold."""
+    prior = prior or {}
+    hits = keyword_hits(text)
+    if sum(hits.values()) < min_keyword_hits:
+        return None
+
+    scores = {label: hits[label] + prior_strength * prior.get(label, 0.0) for label in categories}
+    total = sum(scores.values())
+    if max(scores.values()) / total < threshold:
+        return None
+    return {label: value / total for label, value in scores.items()}
+
 class CategorizerManager:
-    def __init__(self, device=0):
+    def __init__(self, device=None, backend="torch", onnx_cache_dir="data/onnx", source_priors: dict = None,
+                 threshold=0.7, min_keyword_hits=2, prior_strength=3.0):
         logger.info("🔄 Инициализация CategorizerManager...")
         start = time.time()
 
         model_name = "cointegrated/rubert-base-cased-nli-threeway"
         cache_dir = os.environ.get("HF_HOME", "/root/.cache/huggingface")
+        self.backend = backend
 
-        logger.info(f"⚡ Загружаем Zero-Shot классификатор {model_name} на device={device} с cache_dir={cache_dir}...")
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model=model_name,
-            tokenizer=model_name,
-            device=device,
-            cache_dir=cache_dir
-        )
+        if backend == "onnx":
+            logger.info(f"⚡ Загружаем int8 ONNX Zero-Shot классификатор {model_name} (кеш {onnx_cache_dir})...")
+            model, tokenizer = load_quantized(model_name, "sequence-classification", onnx_cache_dir, cache_dir)
+            self.classifier = pipeline(
+                "zero-shot-classification",
+                model=model,
+                tokenizer=tokenizer,
+                device=-1
+            )
+        else:
+            device = resolve_device(device)
+            logger.info(f"⚡ Загружаем Zero-Shot классификатор {model_name} на device={device} с cache_dir={cache_dir}...")
+            self.classifier = pipeline(
+                "zero-shot-classification",
+                model=model_name,
+                tokenizer=model_name,
+                device=device,
+                cache_dir=cache_dir
+            )
 
         self.CATEGORIES = [
             "политика",
@@ -38,10 +109,19 @@ class CategorizerManager:
             "происшествия",
             "другое"
         ]
+        # ответ NLI зависит от модели, бэкенда и набора меток; дешёвая стадия в версию не входит
+        self.version = f"{model_name}@{backend}:{','.join(self.CATEGORIES)}"
+
+        # каскад: априорная категория источника и ключевые слова, NLI — только при низкой уверенности
+        self.source_priors = source_priors or {}
+        self.threshold = threshold
+        self.min_keyword_hits = min_keyword_hits
+        self.prior_strength = prior_strength
+        self.stage_counts = Counter()
 
         logger.info(f"✅ CategorizerManager готов (инициализация заняла {time.time() - start:.2f} сек)")
 
-    def categorize(self, text: str, top_k=1):
+    def categorize(self, text: str, top_k=1, source: str = None):
         if not text.strip():
             logger.warning("⚠️ Попытка классифицировать пустой текст")
             return [], 0.0
@@ -49,17 +129,73 @@ class CategorizerManager:
         logger.info("🚀 Запуск категоризации...")
         start_time = time.time()
 
-        result = self.classifier(
-            text,
-            candidate_labels=self.CATEGORIES,
-            multi_label=False
-        )
+        categories = self.cheap_stage(text, source)
+        if categories is None:
+            categories = self._nli([text])[0]
 
-        categories = [
-            {"label": label, "score": score}
-            for label, score in zip(result["labels"], result["scores"])
-        ]
+        end_time = time.time()
+        logger.info(f"✅ Категоризация ({categories[0]['stage']}) завершена за {end_time - start_time:.2f} секунд")
+        return categories[:top_k], end_time - start_time
+
+    def categorize_batch(self, texts: list[str], top_k=1, batch_size=8, sources: list[str] = None):
+        """Категоризация пачки текстов; для каждого текста — список top_k категорий.
+        Через NLI одним батчем проходят только тексты, не решённые дешёвой стадией."""
+        if not texts:
+            return [], 0.0
+
+        logger.info(f"🚀 Запуск категоризации пачки из {len(texts)} текстов...")
+        start_time = time.time()
+
+        sources = sources or [None] * len(texts)
+        categories = [self.cheap_stage(text, source) for text, source in zip(texts, sources)]
+        unresolved = [i for i, result in enumerate(categories) if result is None]
+        if unresolved:
+            for i, result in zip(unresolved, self._nli([texts[i] for i in unresolved], batch_size)):
+                categories[i] = result
 
         end_time = time.time()
-        logger.info(f"✅ Категоризация завершена за {end_time - start_time:.2f} секунд")
-        return categories[:top_k], end_time - start_time
\ No newline at end of file
+        logger.info(f"✅ Категоризация пачки завершена за {end_time - start_time:.2f} секунд, "
+                    f"NLI понадобился для {len(unresolved)} из {len(texts)}")
+        return [result[:top_k] for result in categories], end_time - start_time
+
+    def cheap_stage(self, text: str, source: str = None):
+        """Первая стадия каскада: априорная категория источника, затем ключевые слова.
+
+        Априорное распределение источника добавляется к числу совпадений
+        ключевых слов как prior_strength псевдосовпадений. Возвращает
+        категории, если уверенность не ниже threshold, иначе None.
+        """
+        prior = self.source_priors.get(source, {})
+        if prior:
+            label, weight = max(prior.items(), key=lambda item: item[1])
+            if weight >= self.threshold:
+                return self._resolved("source", {label: weight})
+
+        scores = keyword_scores(text, self.CATEGORIES, prior, self.threshold, self.min_keyword_hits,
+                                self.prior_strength)
+        if scores is None:
+            return None
+        return self._resolved("keywords", scores)
+
+    def stage_stats(self) -> dict:
+        """Доля новостей, решённых каждой стадией каскада"""
+        total = sum(self.stage_counts.values())
+        return {stage: count / total for stage, count in self.stage_counts.items()} if total else {}
+
+    def _resolved(self, stage: str, scores: dict) -> list:
+        self.stage_counts[stage] += 1
+        return [
+            {"label": label, "score": score, "stage": stage}
+            for label, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        ]
+
+    def _nli(self, texts: list[str], batch_size=8) -> list:
+        results = self.classifier(
+            texts,
+            candidate_labels=self.CATEGORIES,
+            multi_label=False,
+            batch_size=batch_size
+        )
+        if isinstance(results, dict):
+            results = [results]
+        return [self._resolved("nli", dict(zip(result["labels"], result["scores"]))) for result in results]
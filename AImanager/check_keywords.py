@@ -0,0 +1,63 @@
+"""Проверка ключевых слов дешёвой стадии каскада на размеченных примерах.
+
+Дешёвая стадия заменяет NLI, поэтому её ошибка не исправляется дальше по
+каскаду. Пример считается ошибкой, только если ключевые слова уверенно
+дали неверную категорию; нерешённые уходят в NLI и лишь снижают покрытие.
+Модели не загружаются.
+
+    python AImanager/check_keywords.py
+"""
+import argparse
+import sys
+
+from categorizer_manager import KEYWORDS, keyword_scores
+
+CATEGORIES = list(KEYWORDS) + ["другое"]
+
+SANITY_SET = [
+    ("Премьер-министр Михаил Мишустин провёл заседание правительства, премьер поручил подготовить доклад.",
+     "политика"),
+    ("Президент подписал закон, принятый Госдумой, депутаты поддержали его в трёх чтениях.", "политика"),
+    ("На выборах в парламент оппозиция получила треть мест, переговоры о коалиции продолжаются.", "политика"),
+    ("Акции протеста прошли в нескольких городах, полиция задержала участников.", "происшествия"),
+    ("Центробанк сохранил ключевую ставку, инфляция замедлилась, курс рубля укрепился.", "экономика"),
+    ("Акционеры одобрили выплату дивидендов, выручка компании выросла на 12%.", "экономика"),
+    ("Сборная России обыграла соперника в матче отборочного турнира чемпионата мира.", "спорт"),
+    ("Вышел сборник рассказов писателя, книга представлена на фестивале.", "культура"),
+    ("Режиссёр представил фильм на кинофестивале, премьера спектакля состоится в театре.", "культура"),
+    ("Производитель представил новый чип для смартфонов, процессор ускорит работу нейросетей.", "технологии"),
+    ("Хозяйка угостила гостей чипсами и рассказала о выборе рецепта.", "другое"),
+    ("Учёные провели эксперимент с телескопом, исследование опубликовано в журнале.", "наука"),
+    ("В результате ДТП погибли два человека, ещё трое пострадали, на месте работают спасатели МЧС.",
+     "происшествия"),
+    ("Жители жалуются на тарифы ЖКХ, пенсионеры и многодетные семьи просят социальной поддержки.", "общество"),
+]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Проверка ключевых слов каскадного категоризатора")
+    arg_parser.add_argument("--threshold", type=float, default=0.7)
+    arg_parser.add_argument("--min-keyword-hits", type=int, default=2)
+    args = arg_parser.parse_args()
+
+    errors, resolved = 0, 0
+    for text, expected in SANITY_SET:
+        scores = keyword_scores(text, CATEGORIES, threshold=args.threshold, min_keyword_hits=args.min_keyword_hits)
+        if scores is None:
+            print(f"[SKIP] {expected}: ключевые слова не уверены, решит NLI — {text[:60]}")
+            continue
+        resolved += 1
+        label = max(scores, key=scores.get)
+        if label != expected:
+            errors += 1
+            print(f"[ERR] ожидалась «{expected}», ключевые слова дали «{label}» ({scores[label]:.2f}) — {text[:60]}")
+        else:
+            print(f"[OK] {label} ({scores[label]:.2f}) — {text[:60]}")
+
+    print(f"Решено ключевыми словами {resolved} из {len(SANITY_SET)}, ошибок: {errors}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Проверка эквивалентности int8 ONNX-бэкенда и PyTorch.
+
+Прогоняет одни и те же новости через оба бэкенда (каждый в отдельном
+процессе, чтобы честно померить память) и сравнивает результаты:
+пересечение слов резюме (ROUGE-1 F1), совпадение категорий, задержку и
+пиковый RSS.
+
+    python AImanager/compare_backends.py --input data/reextracted.jsonl --limit 50
+"""
+import argparse
+import json
+import multiprocessing
+import re
+import resource
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import redis
+
+
+def load_texts(conf: dict, input_path: str, limit: int) -> list[str]:
+    if input_path:
+        with open(input_path, encoding="utf-8") as file:
+            texts = [json.loads(line).get("text", "") for line in file if line.strip()]
+    else:
+        client = redis.StrictRedis(
+            host=conf["redis"]["host"],
+            port=conf["redis"]["port"],
+            db=conf["redis"].get("db", 0),
+            decode_responses=True
+        )
+        texts = []
+        for key in client.scan_iter("parser:news:*", count=100):
+            raw = client.get(key)
+            if raw:
+                texts.append(json.loads(raw).get("text", ""))
+            if len(texts) >= limit:
+                break
+    return [text for text in texts if text.strip()][:limit]
+
+
+def run_backend(backend: str, texts: list[str], onnx_cache_dir: str) -> dict:
+    from manager import SummarizerManager
+    from categorizer_manager import CategorizerManager
+
+    summarizer = SummarizerManager(backend=backend, onnx_cache_dir=onnx_cache_dir)
+    # порог выше 1 отключает дешёвую стадию каскада: сравниваем именно NLI-модели
+    categorizer = CategorizerManager(backend=backend, onnx_cache_dir=onnx_cache_dir, threshold=float("inf"))
+    summaries, categories, sum_latencies, cat_latencies = [], [], [], []
+    for text in texts:
+        summary, sum_duration = summarizer.summarize(text)
+        result, cat_duration = categorizer.categorize(summary)
+        summaries.append(summary)
+        categories.append(result[0]["label"] if result else "другое")
+        sum_latencies.append(sum_duration)
+        cat_latencies.append(cat_duration)
+    return {
+        "summaries": summaries,
+        "categories": categories,
+        "summarize_ms": statistics.mean(sum_latencies) * 1000,
+        "categorize_ms": statistics.mean(cat_latencies) * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def rouge1_f1(reference: str, candidate: str) -> float:
+    reference_words = Counter(re.findall(r"\w+", reference.lower()))
+    candidate_words = Counter(re.findall(r"\w+", candidate.lower()))
+    overlap = sum((reference_words & candidate_words).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(candidate_words.values())
+    recall = overlap / sum(reference_words.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Сравнение ONNX int8 и PyTorch бэкендов AImanager")
+    arg_parser.add_argument("--config", default="config.json")
+    arg_parser.add_argument("--input", help="JSONL с полем text; по умолчанию новости из Redis")
+    arg_parser.add_argument("--limit", type=int, default=50)
+    arg_parser.add_argument("--onnx-cache-dir", default="data/onnx")
+    arg_parser.add_argument("--min-overlap", type=float, default=0.5)
+    arg_parser.add_argument("--min-agreement", type=float, default=0.85)
+    args = arg_parser.parse_args()
+
+    with open(args.config, encoding="utf-8") as file:
+        conf = json.load(file)
+    texts = load_texts(conf, args.input, args.limit)
+    if not texts:
+        print("Нет текстов для сравнения")
+        sys.exit(1)
+
+    results = {}
+    for backend in ("torch", "onnx"):
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results[backend] = executor.submit(run_backend, backend, texts, args.onnx_cache_dir).result()
+        print(f"{backend}: {len(texts)} новостей за {time.monotonic() - started:.1f} с (с загрузкой), "
+              f"суммаризация {results[backend]['summarize_ms']:.0f} мс, "
+              f"категоризация {results[backend]['categorize_ms']:.0f} мс, "
+              f"пиковый RSS {results[backend]['peak_rss_mb']:.0f} МБ")
+
+    torch_result, onnx_result = results["torch"], results["onnx"]
+    overlap = statistics.mean(
+        rouge1_f1(reference, candidate)
+        for reference, candidate in zip(torch_result["summaries"], onnx_result["summaries"])
+    )
+    agreement = statistics.mean(
+        reference == candidate
+        for reference, candidate in zip(torch_result["categories"], onnx_result["categories"])
+    )
+    print(f"Пересечение резюме (ROUGE-1 F1): {overlap:.3f}, совпадение категорий: {agreement:.1%}")
+    print(f"Ускорение: суммаризация x{torch_result['summarize_ms'] / onnx_result['summarize_ms']:.2f}, "
+          f"категоризация x{torch_result['categorize_ms'] / onnx_result['categorize_ms']:.2f}")
+
+    if overlap < args.min_overlap or agreement < args.min_agreement:
+        print(f"[ERR] ONNX-бэкенд расходится с PyTorch сильнее допустимого "
+              f"(пересечение >= {args.min_overlap}, совпадение >= {args.min_agreement:.0%})")
+        sys.exit(1)
+    print("[OK] ONNX-бэкенд эквивалентен PyTorch в пределах порогов")
+
+
+if __name__ == "__main__":
+    main()
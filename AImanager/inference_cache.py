@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger("InferenceCache")
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class InferenceCache:
+    """Кеш резюме и ответов NLI-категоризатора по содержимому текста.
+
+    Ключ — sha256 от нормализованного текста и версии моделей, поэтому
+    смена модели или бэкенда не отдаёт старые результаты. Перед Redis
+    (`ai:cache:<hash>`, живёт ttl секунд) стоит LRU на lru_size записей в
+    памяти процесса.
+    """
+
+    def __init__(self, redis_client, model_version: str, ttl: int = 7 * 24 * 3600, lru_size: int = 2048,
+                 prefix: str = "ai:cache:"):
+        self.redis_client = redis_client
+        self.model_version = model_version
+        self.ttl = ttl
+        self.lru_size = lru_size
+        self.prefix = prefix
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"lru_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_version}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+        return self.prefix + digest
+
+    def get_many(self, texts: list[str]) -> list:
+        """Результаты для texts (None при промахе); Redis опрашивается одним MGET только для промахов LRU"""
+        keys = [self.key(text) for text in texts]
+        results = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    results[i] = self._lru[key]
+                    self.counters["lru_hits"] += 1
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            try:
+                raw_values = self.redis_client.mget([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"⚠️ Кеш в Redis недоступен: {e}")
+                raw_values = [None] * len(missing)
+            for i, raw in zip(missing, raw_values):
+                if raw:
+                    results[i] = json.loads(raw)
+                    self._remember(keys[i], results[i])
+                    self.counters["redis_hits"] += 1
+                else:
+                    self.counters["misses"] += 1
+        return results
+
+    def get(self, text: str):
+        return self.get_many([text])[0]
+
+    def put(self, text: str, result: dict):
+        key = self.key(text)
+        self._remember(key, result)
+        try:
+            self.redis_client.set(key, json.dumps(result, ensure_ascii=False), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось записать результат в кеш Redis: {e}")
+
+    def stats(self) -> dict:
+        lookups = sum(self.counters.values())
+        hits = self.counters["lru_hits"] + self.counters["redis_hits"]
+        return {**self.counters, "hit_rate": hits / lookups if lookups else 0.0}
+
+    def _remember(self, key: str, result: dict):
+        with self._lock:
+            self._lru[key] = result
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
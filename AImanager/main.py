@@ -5,6 +5,7 @@ import logging
 import time
 from manager import SummarizerManager
 from categorizer_manager import CategorizerManager
+from inference_cache import InferenceCache
 import uuid
 
 logger = logging.getLogger("NewsConsumer")
@@ -18,6 +19,10 @@ logger.addHandler(ch)
 class NewsConsumer:
     def __init__(self, conf: dict):
         self.conf = conf
+        consumer_conf = conf.get('consumer', {})
+        self.batch_size = consumer_conf.get('batch_size', 1)
+        self.max_wait = consumer_conf.get('max_wait', 2.0)
+        self.prefetch_count = consumer_conf.get('prefetch', self.batch_size)
 
         # --- Redis ---
         self.redis_client = redis.StrictRedis(
@@ -29,8 +34,28 @@ class NewsConsumer:
         logger.info("✅ Подключение к Redis успешно")
 
         # --- Summarizer и Categorizer ---
-        self.summarizer_manager = SummarizerManager(device=0)
-        self.categorizer_manager = CategorizerManager(device=0)
+        backend = consumer_conf.get('backend', 'torch')
+        device = consumer_conf.get('device')
+        onnx_cache_dir = consumer_conf.get('onnx_cache_dir', 'data/onnx')
+        self.summarizer_manager = SummarizerManager(device=device, backend=backend, onnx_cache_dir=onnx_cache_dir)
+        categorizer_conf = conf.get('categorizer', {})
+        self.categorizer_manager = CategorizerManager(
+            device=device,
+            backend=backend,
+            onnx_cache_dir=onnx_cache_dir,
+            source_priors=categorizer_conf.get('source_priors'),
+            threshold=categorizer_conf.get('threshold', 0.7),
+            min_keyword_hits=categorizer_conf.get('min_keyword_hits', 2)
+        )
+
+        # --- Кеш результатов ---
+        cache_conf = conf.get('inference_cache', {})
+        self.inference_cache = InferenceCache(
+            self.redis_client,
+            model_version=f"{self.summarizer_manager.version}|{self.categorizer_manager.version}",
+            ttl=cache_conf.get('ttl_hours', 168) * 3600,
+            lru_size=cache_conf.get('lru_size', 2048)
+        ) if cache_conf.get('enabled') else None
 
         # --- RabbitMQ ---
         self.connect_rabbitmq()
@@ -58,14 +83,15 @@ class NewsConsumer:
                 self.processed_queue_name = self.conf['rabbitmq'].get('processed_queue', 'processed_news')
                 self.channel.queue_declare(queue=self.queue_name, durable=True)
                 self.channel.queue_declare(queue=self.processed_queue_name, durable=True)
-                self.channel.basic_qos(prefetch_count=1)
+                self.channel.basic_qos(prefetch_count=self.prefetch_count)
 
-                # Подписка на очередь
-                self.channel.basic_consume(
-                    queue=self.queue_name,
-                    on_message_callback=self.callback,
-                    auto_ack=False
-                )
+                # Подписка на очередь (в пакетном режиме сообщения забирает consume_batches)
+                if self.batch_size <= 1:
+                    self.channel.basic_consume(
+                        queue=self.queue_name,
+                        on_message_callback=self.callback,
+                        auto_ack=False
+                    )
 
                 logger.info("✅ Подключение к RabbitMQ успешно")
                 break
@@ -77,22 +103,51 @@ class NewsConsumer:
         logger.info("🚀 Консюмер запущен. Ожидание сообщений...")
         while True:
             try:
-                self.channel.start_consuming()
+                if self.batch_size > 1:
+                    self.consume_batches()
+                else:
+                    self.channel.start_consuming()
             except KeyboardInterrupt:
                 logger.info("🛑 Консюмер завершает работу.")
                 break
-            except (pika.exceptions.StreamLostError, pika.exceptions.ConnectionClosed, pika.exceptions.AMQPConnectionError) as e:
+            except (pika.exceptions.StreamLostError, pika.exceptions.ConnectionClosed, pika.exceptions.AMQPConnectionError,
+                    pika.exceptions.ChannelWrongStateError) as e:
                 logger.warning(f"⚠️ Соединение с RabbitMQ потеряно: {e}, переподключаемся...")
                 self.connect_rabbitmq()
 
     def callback(self, ch, method, properties, body):
         """Основная логика обработки сообщения"""
+        news_data = self.load_news(ch, method, body)
+        if news_data is not None:
+            self.process_news(ch, method, news_data)
+
+    def consume_batches(self):
+        """Пакетный режим: копит до batch_size сообщений, но не дольше max_wait секунд с первого"""
+        logger.info(f"📦 Пакетный режим: до {self.batch_size} сообщений, ожидание до {self.max_wait} сек")
+        channel = self.channel
+        batch = []
+        deadline = None
+        for method, properties, body in channel.consume(
+                self.queue_name, auto_ack=False, inactivity_timeout=min(self.max_wait, 0.5)):
+            if method is not None:
+                batch.append((method, body))
+                deadline = deadline or time.monotonic() + self.max_wait
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self.process_batch(channel, batch)
+                batch = []
+                deadline = None
+            if self.channel is not channel:
+                # при отправке произошло переподключение, продолжаем на новом канале
+                return
+
+    def load_news(self, ch, method, body):
+        """Достаёт новость из Redis; пустые и пропавшие сразу подтверждаются"""
         key = body.decode('utf-8')
         news_json_raw = self.redis_client.get(key)
         if not news_json_raw:
             logger.warning(f"⚠️ Ключ '{key}' не найден в Redis")
             ch.basic_ack(delivery_tag=method.delivery_tag)
-            return
+            return None
 
         news_data = json.loads(news_json_raw)
         text = news_data.get('text', "")
@@ -100,41 +155,168 @@ class NewsConsumer:
         if not text.strip():
             logger.warning("⚠️ Текст новости пустой, суммаризация пропущена")
             ch.basic_ack(delivery_tag=method.delivery_tag)
-            return
+            return None
+        return news_data
 
+    def process_news(self, ch, method, news_data: dict):
         try:
-            # --- Summarization ---
-            summary, sum_duration = self.summarizer_manager.summarize(text)
-            logger.info(f"[SUMMARY]: {summary}")
-            logger.info(f"⏱ Время суммаризации: {sum_duration:.2f} сек")
+            cached = self.cached_results([news_data])[0]
+            if cached:
+                categories = self.categories_from_cache(news_data, cached)
+                if categories is not None:
+                    logger.info("♻️ Результат взят из кеша, инференс пропущен")
+                    self.complete(ch, method, news_data, cached["summary"], categories)
+                    return
+                logger.info("♻️ Резюме взято из кеша, нужна только категоризация")
+                summary = cached["summary"]
+            else:
+                # --- Summarization ---
+                summary, sum_duration = self.summarizer_manager.summarize(news_data['text'])
+                logger.info(f"⏱ Время суммаризации: {sum_duration:.2f} сек")
 
             # --- Categorization ---
-            categories, cat_duration = self.categorizer_manager.categorize(summary)
-            best_cat = categories[0]["label"] if categories else "другое"
-            score = categories[0]["score"] if categories else 0.0
-            logger.info(f"[CATEGORY]: {best_cat} (score={score:.2f})")
+            categories, cat_duration = self.categorizer_manager.categorize(summary, source=self.news_source(news_data))
             logger.info(f"⏱ Время категоризации: {cat_duration:.2f} сек")
+            self.log_cascade_stats()
 
-            # --- Формируем JSON ---
-            processed_news = {
-                **news_data,
-                "id": str(uuid.uuid4()),
-                "title": news_data.get('header', ''),
-                "summary": summary,
-                "category": best_cat
-            }
-
-            # --- Отправка ---
-            self.send_to_processed_queue(processed_news, ch)
-
-            # --- Подтверждение ---
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.info("✅ Сообщение успешно обработано")
+            self.remember_result(news_data, summary, categories)
+            self.complete(ch, method, news_data, summary, categories)
 
         except Exception as e:
             logger.error(f"❌ Ошибка при обработке текста: {e}", exc_info=True)
             ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
+    def process_batch(self, ch, messages: list):
+        """Суммаризация и категоризация пачки; публикация и ack каждого сообщения отдельно"""
+        items = []
+        for method, body in messages:
+            try:
+                news_data = self.load_news(ch, method, body)
+            except Exception as e:
+                logger.error(f"❌ Не удалось прочитать новость: {e}", exc_info=True)
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                continue
+            if news_data is not None:
+                items.append((method, news_data))
+        if not items:
+            return
+
+        results = self.cached_results([news_data for _, news_data in items])
+        summaries = [result["summary"] if result else None for result in results]
+        categories = [self.categories_from_cache(news_data, result) if result else None
+                      for (_, news_data), result in zip(items, results)]
+        pending = [i for i, news_categories in enumerate(categories) if news_categories is None]
+        if len(pending) < len(items):
+            logger.info(f"♻️ Из кеша взято {len(items) - len(pending)} из {len(items)} результатов пачки")
+
+        if pending:
+            pending_summaries = [i for i in pending if summaries[i] is None]
+            try:
+                sum_duration = 0.0
+                if pending_summaries:
+                    new_summaries, sum_duration = self.summarizer_manager.summarize_batch(
+                        [items[i][1]['text'] for i in pending_summaries], batch_size=self.batch_size)
+                    for i, summary in zip(pending_summaries, new_summaries):
+                        summaries[i] = summary
+                new_categories, cat_duration = self.categorizer_manager.categorize_batch(
+                    [summaries[i] for i in pending], batch_size=self.batch_size,
+                    sources=[self.news_source(items[i][1]) for i in pending])
+            except Exception as e:
+                # одна «плохая» новость не должна ронять всю пачку: обрабатываем по одной
+                logger.warning(f"⚠️ Пакетная обработка не удалась ({e}), обрабатываем {len(items)} новостей по одной")
+                for method, news_data in items:
+                    self.process_news(ch, method, news_data)
+                return
+            logger.info(f"⏱ Пачка из {len(pending)}: суммаризация {sum_duration:.2f} сек "
+                        f"({len(pending_summaries)} текстов), категоризация {cat_duration:.2f} сек")
+            if pending_summaries:
+                logger.info(f"📊 Паддинг суммаризации с запуска: {self.summarizer_manager.padding_ratio():.1%}")
+            self.log_cascade_stats()
+            for i, news_categories in zip(pending, new_categories):
+                self.remember_result(items[i][1], summaries[i], news_categories)
+                categories[i] = news_categories
+
+        for (method, news_data), summary, news_categories in zip(items, summaries, categories):
+            if self.channel is not ch:
+                logger.warning("⚠️ Канал переподключён, неподтверждённые сообщения пачки будут доставлены повторно")
+                return
+            try:
+                self.complete(ch, method, news_data, summary, news_categories)
+            except Exception as e:
+                logger.error(f"❌ Ошибка при отправке новости: {e}", exc_info=True)
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+    def cached_results(self, news: list) -> list:
+        """Готовые результаты из кеша (None при промахе).
+
+        Для почти-дубликата, помеченного парсером duplicate_of, при промахе
+        берётся результат оригинала.
+        """
+        if not self.inference_cache:
+            return [None] * len(news)
+        results = self.inference_cache.get_many([news_data['text'] for news_data in news])
+        for i, news_data in enumerate(news):
+            if results[i] is None and news_data.get('duplicate_of'):
+                try:
+                    original_raw = self.redis_client.get(news_data['duplicate_of'])
+                except redis.RedisError as e:
+                    logger.warning(f"⚠️ Не удалось прочитать оригинал {news_data['duplicate_of']}: {e}")
+                    continue
+                if original_raw:
+                    results[i] = self.inference_cache.get(json.loads(original_raw).get('text', ''))
+        stats = self.inference_cache.stats()
+        logger.info(f"📊 Кеш инференса: попаданий {stats['hit_rate']:.0%} "
+                    f"(LRU {stats['lru_hits']}, Redis {stats['redis_hits']}, промахов {stats['misses']})")
+        return results
+
+    def categories_from_cache(self, news_data: dict, cached: dict):
+        """Категории для закешированного резюме.
+
+        Дешёвая стадия каскада зависит от источника и настроек, поэтому
+        пересчитывается; из кеша берётся только ответ NLI. None — нужен NLI.
+        """
+        categories = self.categorizer_manager.cheap_stage(cached["summary"], self.news_source(news_data))
+        if categories is None:
+            categories = cached.get("nli_categories")
+        return categories[:1] if categories else None
+
+    def remember_result(self, news_data: dict, summary: str, categories: list):
+        if self.inference_cache:
+            nli_categories = categories if categories and categories[0].get("stage") == "nli" else None
+            self.inference_cache.put(news_data['text'], {"summary": summary, "nli_categories": nli_categories})
+
+    @staticmethod
+    def news_source(news_data: dict):
+        # парсер пишет имя ресурса в source (и исторически в sourse)
+        return news_data.get('source') or news_data.get('sourse')
+
+    def log_cascade_stats(self):
+        stats = self.categorizer_manager.stage_stats()
+        logger.info("📊 Каскад категоризации: " + ", ".join(f"{stage} {share:.0%}" for stage, share in stats.items()))
+
+    def complete(self, ch, method, news_data: dict, summary: str, categories: list):
+        """Формирует обработанную новость, отправляет её и подтверждает сообщение"""
+        best_cat = categories[0]["label"] if categories else "другое"
+        score = categories[0]["score"] if categories else 0.0
+        logger.info(f"[SUMMARY]: {summary}")
+        logger.info(f"[CATEGORY]: {best_cat} (score={score:.2f})")
+
+        # --- Формируем JSON ---
+        processed_news = {
+            **news_data,
+            "id": str(uuid.uuid4()),
+            "title": news_data.get('header', ''),
+            "summary": summary,
+            "category": best_cat
+        }
+
+        # --- Отправка ---
+        self.send_to_processed_queue(processed_news, ch)
+
+        # --- Подтверждение ---
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        logger.info("✅ Сообщение успешно обработано")
+
     def send_to_processed_queue(self, news_json: dict, ch):
         """Отправка обработанной новости с переподключением при потере соединения"""
         while True:
@@ -1,7 +1,9 @@
 import logging
 import os
 import time
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from onnx_backend import load_quantized, resolve_device
 
 logger = logging.getLogger("SummarizerManager")
 logger.setLevel(logging.INFO)
@@ -10,25 +12,36 @@ formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
 ch.setFormatter(formatter)
 logger.addHandler(ch)
 
+# границы корзин по длине входа в токенах
+LENGTH_BUCKETS = (32, 64, 128, 256, 384, 600)
+
 class SummarizerManager:
-    def __init__(self, model_name="IlyaGusev/rut5_base_sum_gazeta", device=0):
+    def __init__(self, model_name="IlyaGusev/rut5_base_sum_gazeta", device=None, max_input_length=600,
+                 backend="torch", onnx_cache_dir="data/onnx"):
         logger.info("🔄 Инициализация SummarizerManager...")
         start = time.time()
 
         cache_dir = os.environ.get("HF_HOME", "/root/.cache/huggingface")
-        logger.info(f"📥 Загружаем токенизатор {model_name} с cache_dir={cache_dir}...")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
-
-        logger.info(f"📥 Загружаем модель {model_name} с cache_dir={cache_dir}...")
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name, cache_dir=cache_dir)
-
-        logger.info(f"⚡ Создаём пайплайн summarization на device={device}...")
-        self.summarizer = pipeline(
-            "summarization",
-            model=self.model,
-            tokenizer=self.tokenizer,
-            device=device
-        )
+        if backend == "onnx":
+            # int8-модель ONNX Runtime считается на CPU
+            logger.info(f"📥 Загружаем int8 ONNX-модель {model_name} (кеш {onnx_cache_dir})...")
+            self.model, self.tokenizer = load_quantized(model_name, "seq2seq", onnx_cache_dir, cache_dir)
+            device = -1
+        else:
+            device = resolve_device(device)
+            logger.info(f"📥 Загружаем токенизатор {model_name} с cache_dir={cache_dir}...")
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
+
+            logger.info(f"📥 Загружаем модель {model_name} с cache_dir={cache_dir}...")
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name, cache_dir=cache_dir)
+            logger.info(f"⚡ Переносим модель на device={device}...")
+            self.model.to("cpu" if device == -1 else f"cuda:{device}")
+        self.backend = backend
+        # резюме зависит и от усечения входа, поэтому оно входит в версию для кеша инференса
+        self.version = f"{model_name}@{backend}:{max_input_length}"
+
+        self.max_input_length = max_input_length
+        self.padding_stats = {"tokens": 0, "padded_tokens": 0, "naive_padded_tokens": 0}
 
         logger.info(f"✅ SummarizerManager готов (инициализация заняла {time.time() - start:.2f} сек)")
 
@@ -40,13 +53,76 @@ class SummarizerManager:
         logger.info("🚀 Запуск суммаризации...")
         start_time = time.time()
 
-        summary = self.summarizer(
-            text,
-            max_length=max_length,
-            min_length=min_length,
-            do_sample=False
-        )
+        encodings = self.tokenizer([text], truncation=True, max_length=self.max_input_length)
+        summary = self._generate(encodings, [0], min_length, max_length)[0]
 
         end_time = time.time()
         logger.info(f"✅ Суммаризация завершена за {end_time - start_time:.2f} секунд")
-        return summary[0]["summary_text"], end_time - start_time
\ No newline at end of file
+        return summary, end_time - start_time
+
+    def summarize_batch(self, texts: list[str], min_length=30, max_length=100, batch_size=8):
+        """Суммаризация пачки текстов с группировкой по длине; порядок результатов совпадает с texts.
+
+        Тексты токенизируются один раз, сортируются по длине и раскладываются
+        по корзинам LENGTH_BUCKETS, так что в одном батче оказываются тексты
+        близкой длины и паддинга почти нет. Вход усекается и резюме
+        генерируется так же, как в summarize(), поэтому для одного текста оба
+        пути дают одно резюме.
+        """
+        if not texts:
+            return [], 0.0
+
+        logger.info(f"🚀 Запуск суммаризации пачки из {len(texts)} текстов...")
+        start_time = time.time()
+
+        encodings = self.tokenizer(texts, truncation=True, max_length=self.max_input_length)
+        lengths = [len(input_ids) for input_ids in encodings["input_ids"]]
+
+        buckets = {}
+        for index in sorted(range(len(texts)), key=lambda i: lengths[i]):
+            bucket = next((limit for limit in LENGTH_BUCKETS if lengths[index] <= limit), LENGTH_BUCKETS[-1])
+            buckets.setdefault(bucket, []).append(index)
+
+        summaries = [""] * len(texts)
+        padded_tokens = 0
+        for indices in buckets.values():
+            for offset in range(0, len(indices), batch_size):
+                chunk = indices[offset:offset + batch_size]
+                longest = max(lengths[i] for i in chunk)
+                padded_tokens += longest * len(chunk)
+
+                for i, summary in zip(chunk, self._generate(encodings, chunk, min_length, max_length)):
+                    summaries[i] = summary
+
+        naive_padded_tokens = sum(
+            max(lengths[offset:offset + batch_size]) * len(lengths[offset:offset + batch_size])
+            for offset in range(0, len(lengths), batch_size)
+        )
+        self.padding_stats["tokens"] += sum(lengths)
+        self.padding_stats["padded_tokens"] += padded_tokens
+        self.padding_stats["naive_padded_tokens"] += naive_padded_tokens
+
+        end_time = time.time()
+        logger.info(
+            f"✅ Суммаризация пачки завершена за {end_time - start_time:.2f} секунд, "
+            f"корзин {len(buckets)}, паддинг {1 - sum(lengths) / padded_tokens:.1%} "
+            f"(без группировки было бы {1 - sum(lengths) / naive_padded_tokens:.1%}), "
+            f"{sum(lengths) / (end_time - start_time):.0f} входных токенов/сек"
+        )
+        return summaries, end_time - start_time
+
+    def _generate(self, encodings, indices: list[int], min_length: int, max_length: int) -> list[str]:
+        """Резюме для текстов indices из уже токенизированных encodings (одним батчем с паддингом)"""
+        batch = self.tokenizer.pad(
+            {key: [encodings[key][i] for i in indices] for key in ("input_ids", "attention_mask")},
+            return_tensors="pt"
+        ).to(self.model.device)
+        with torch.inference_mode():
+            output = self.model.generate(**batch, max_length=max_length, min_length=min_length, do_sample=False)
+        return [summary.strip() for summary in self.tokenizer.batch_decode(output, skip_special_tokens=True)]
+
+    def padding_ratio(self) -> float:
+        """Доля паддинга во всех батчах с момента запуска"""
+        if not self.padding_stats["padded_tokens"]:
+            return 0.0
+        return 1 - self.padding_stats["tokens"] / self.padding_stats["padded_tokens"]
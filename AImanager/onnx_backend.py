@@ -0,0 +1,92 @@
+import logging
+import os
+import time
+
+logger = logging.getLogger("OnnxBackend")
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+# onnx-файлы, которые optimum создаёт при экспорте каждой задачи
+ONNX_FILES = {
+    "seq2seq": ["encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx"],
+    "sequence-classification": ["model.onnx"],
+}
+QUANTIZED_SUFFIX = "quantized"
+
+
+def resolve_device(device=None):
+    """device из конфига или 0 при наличии CUDA, иначе CPU (-1)"""
+    if device is not None:
+        return device
+    import torch
+    return 0 if torch.cuda.is_available() else -1
+
+
+def quantized_model_dir(model_name: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, model_name.replace("/", "__") + "-int8")
+
+
+def _model_class(task: str):
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+    return ORTModelForSeq2SeqLM if task == "seq2seq" else ORTModelForSequenceClassification
+
+
+def export_quantized(model_name: str, task: str, cache_dir: str, hf_cache_dir: str = None) -> str:
+    """Экспорт модели в ONNX и динамическое int8-квантование весов.
+
+    Результат кешируется в cache_dir: повторный запуск только загружает
+    готовые файлы.
+    """
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    target_dir = quantized_model_dir(model_name, cache_dir)
+    if all(os.path.exists(os.path.join(target_dir, _quantized_name(name))) for name in ONNX_FILES[task]):
+        return target_dir
+
+    logger.info(f"📦 Экспорт {model_name} в ONNX и int8-квантование в {target_dir}...")
+    start = time.time()
+    export_dir = target_dir + "-fp32"
+    model = _model_class(task).from_pretrained(model_name, export=True, cache_dir=hf_cache_dir)
+    model.save_pretrained(export_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=hf_cache_dir)
+
+    quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    for file_name in ONNX_FILES[task]:
+        quantizer = ORTQuantizer.from_pretrained(export_dir, file_name=file_name)
+        quantizer.quantize(save_dir=target_dir, quantization_config=quantization_config, file_suffix=QUANTIZED_SUFFIX)
+    model.config.save_pretrained(target_dir)
+    if getattr(model, "generation_config", None) is not None:
+        model.generation_config.save_pretrained(target_dir)
+    tokenizer.save_pretrained(target_dir)
+
+    logger.info(f"✅ Экспорт {model_name} завершён за {time.time() - start:.2f} сек")
+    return target_dir
+
+
+def load_quantized(model_name: str, task: str, cache_dir: str, hf_cache_dir: str = None):
+    """Загружает (при необходимости экспортирует) int8-модель; возвращает (модель, токенизатор)"""
+    from transformers import AutoTokenizer
+
+    model_dir = export_quantized(model_name, task, cache_dir, hf_cache_dir)
+    files = [_quantized_name(name) for name in ONNX_FILES[task]]
+    if task == "seq2seq":
+        model = _model_class(task).from_pretrained(
+            model_dir,
+            encoder_file_name=files[0],
+            decoder_file_name=files[1],
+            decoder_with_past_file_name=files[2],
+            provider="CPUExecutionProvider",
+        )
+    else:
+        model = _model_class(task).from_pretrained(model_dir, file_name=files[0], provider="CPUExecutionProvider")
+    return model, AutoTokenizer.from_pretrained(model_dir)
+
+
+def _quantized_name(file_name: str) -> str:
+    base, extension = os.path.splitext(file_name)
+    return f"{base}_{QUANTIZED_SUFFIX}{extension}"
@@ -0,0 +1,62 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import zstandard
+from extraction import extract_article
+
+logger = logging.getLogger(__name__)
+
+
+class HtmlArchive:
+    """Локальный архив скачанных статей для повторного извлечения без сети.
+
+    Адресация по sha256 ссылки: <root>/<ab>/<cd>/<hash>.zst. Файл — сжатые
+    zstd строка JSON с метаданными (url, ресурс, кодировка, время) и байты HTML.
+    """
+
+    def __init__(self, root: str, level: int = 3):
+        self.root = root
+        self.level = level
+
+    def path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.zst")
+
+    def put(self, url: str, html: bytes, resource: str = None, charset: str = None):
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {"url": url, "resource": resource, "charset": charset, "fetched_at": time.time()}
+        payload = json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n" + html
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(zstandard.ZstdCompressor(level=self.level).compress(payload))
+        os.replace(tmp_path, path)
+
+    def get(self, url: str) -> tuple[dict, bytes] | None:
+        path = self.path(url)
+        return self.load(path) if os.path.exists(path) else None
+
+    @staticmethod
+    def load(path: str) -> tuple[dict, bytes]:
+        with open(path, "rb") as file:
+            payload = zstandard.ZstdDecompressor().decompress(file.read())
+        meta, _, html = payload.partition(b"\n")
+        return json.loads(meta), html
+
+    def paths(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".zst"):
+                    yield os.path.join(directory, name)
+
+
+def reextract_path(path: str, news_parsers: dict = None) -> dict | None:
+    """Повторно извлекает статью из архива; news_parsers — текущие news_parser ресурсов."""
+    meta, html = HtmlArchive.load(path)
+    news_parser = (news_parsers or {}).get(meta.get("resource"))
+    article_data = extract_article(meta["url"], html, news_parser, meta.get("charset"))
+    if not article_data:
+        return None
+    return {**article_data, "url": meta["url"], "source": meta.get("resource")}
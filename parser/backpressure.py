@@ -0,0 +1,90 @@
+import time
+import logging
+import threading
+from publisher import RabbitPublisher
+from state import RedisStateStore
+
+logger = logging.getLogger(__name__)
+
+NORMAL = "normal"
+THROTTLED = "throttled"
+PAUSED = "paused"
+
+
+class Backpressure:
+    """Обратное давление от очереди сырых новостей к парсеру.
+
+    update() читает глубину очереди и число потребителей. Выше
+    high_watermark интервалы опроса растягиваются пропорционально глубине
+    (не более max_stretch раз), а ресурсы с "priority": "low" не
+    опрашиваются. Выше pause_watermark, а без потребителей — уже выше
+    high_watermark, не опрашиваются все ресурсы, кроме "priority": "high".
+    Обычный режим возвращается, когда глубина опускается ниже
+    low_watermark. Отложенные ресурсы перепроверяются при следующем замере
+    очереди. Текущее состояние сохраняется в Redis (`parser:backpressure`).
+    """
+
+    def __init__(self, publisher: RabbitPublisher, high_watermark: int, low_watermark: int = None,
+                 pause_watermark: int = None, max_stretch: float = 4.0, store: RedisStateStore = None):
+        self.publisher = publisher
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark if low_watermark is not None else high_watermark // 2
+        self.pause_watermark = pause_watermark
+        self.max_stretch = max_stretch
+        self.store = store
+        self._lock = threading.Lock()
+        self._state = {"state": NORMAL, "depth": None, "consumers": None, "stretch": 1.0, "checked_at": None}
+
+    def update(self) -> dict:
+        try:
+            depth, consumers = self.publisher.queue_depth()
+        except Exception as e:
+            logger.warning(f"Failed to read queue depth, keeping throttle state: {e}")
+            return self.state()
+
+        with self._lock:
+            previous = self._state["state"]
+            # без потребителей (например, AImanager ещё грузит модели) мелкая очередь не повод
+            # останавливать сбор: пауза только если очередь при этом уже выросла
+            if (self.pause_watermark and depth >= self.pause_watermark) or \
+                    (consumers == 0 and depth >= self.high_watermark):
+                state = PAUSED
+            elif depth >= self.high_watermark or (previous != NORMAL and depth > self.low_watermark):
+                state = THROTTLED
+            else:
+                state = NORMAL
+            stretch = 1.0 if state == NORMAL else \
+                min(self.max_stretch, max(1.0, depth / max(self.high_watermark, 1)))
+            if state == PAUSED:
+                stretch = self.max_stretch
+            self._state = {
+                "state": state,
+                "depth": depth,
+                "consumers": consumers,
+                "stretch": stretch,
+                "checked_at": time.time(),
+            }
+            current = dict(self._state)
+
+        if state != previous:
+            logger.info(f"Backpressure {previous} -> {state}: queue depth {depth}, consumers {consumers}")
+        if self.store:
+            self.store.set(self.publisher.queue, current)
+        return current
+
+    def state(self) -> dict:
+        with self._lock:
+            return dict(self._state)
+
+    def stretch(self, interval: float) -> float:
+        with self._lock:
+            return interval * self._state["stretch"]
+
+    def allows(self, priority: str = None) -> bool:
+        with self._lock:
+            state = self._state["state"]
+        if state == PAUSED:
+            return priority == "high"
+        if state == THROTTLED:
+            return priority != "low"
+        return True
@@ -0,0 +1,224 @@
+"""Бенчмарки парсера.
+
+    python parser/bench.py extraction --workers 1 2 4
+    python parser/bench.py extraction --html-dir data/html --workers 1 2 4 8
+    python parser/bench.py extraction --html-dir data/html/tass --news-parser tass
+
+Сквозной замер без обращения к живым сайтам: сначала записываем ленты и
+статьи, затем воспроизводим их через локальный HTTP-сервер.
+
+    python parser/bench.py record --fixtures data/fixtures
+    python parser/bench.py ingest --fixtures data/fixtures --latency 0.2 --concurrency 4 16 --workers 0 4
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import multiprocessing
+from resource import getrusage, RUSAGE_SELF, RUSAGE_CHILDREN
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from extraction import extract_article
+from parser import Parser
+from rate_limiter import DomainRateLimiter
+from replay import FixtureStore, RecordingFetcher, ReplayServer, ReplayFetcher
+
+SAMPLE_PARAGRAPH = (
+    "Правительство обсудило меры поддержки регионов, пострадавших от паводков. "
+    "По словам министра, средства будут направлены на восстановление дорог, мостов и жилья, "
+    "а также на компенсации жителям, чьё имущество было повреждено. "
+)
+
+
+def synthetic_pages(count: int, paragraphs: int = 40) -> list[tuple[str, bytes]]:
+    pages = []
+    for i in range(count):
+        body = "".join(f"<p>{SAMPLE_PARAGRAPH * 3}</p>" for _ in range(paragraphs))
+        html = (
+            f"<html><head><title>Новость {i}</title>"
+            f'<meta property="article:published_time" content="2025-05-17T10:00:00">'
+            f"</head><body><nav><a href='/'>Главная</a></nav>"
+            f"<article><h1>Новость {i}</h1>{body}</article>"
+            f"<footer>© Редакция</footer></body></html>"
+        )
+        pages.append((f"https://example.com/news/{i}", html.encode("utf-8")))
+    return pages
+
+
+def load_pages(html_dir: str) -> list[tuple[str, bytes]]:
+    pages = []
+    for name in sorted(os.listdir(html_dir)):
+        with open(os.path.join(html_dir, name), "rb") as file:
+            pages.append((f"https://example.com/{name}", file.read()))
+    return pages
+
+
+async def extraction_rate(pages: list[tuple[str, bytes]], executor: Executor, news_parser: str = None) -> float:
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        loop.run_in_executor(executor, extract_article, url, html, news_parser) for url, html in pages
+    ))
+    return len(pages) / (time.perf_counter() - start)
+
+
+def bench_extraction(args):
+    pages = load_pages(args.html_dir) if args.html_dir else synthetic_pages(args.articles)
+    print(f"Статей: {len(pages)}, CPU: {os.cpu_count()}")
+
+    with ThreadPoolExecutor(max_workers=max(args.workers)) as executor:
+        asyncio.run(extraction_rate(pages[:1], executor))
+        rate = asyncio.run(extraction_rate(pages, executor, args.news_parser))
+        print(f"threads x{max(args.workers)}: {rate:.1f} статей/с")
+
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            # прогрев: запуск процессов и импорт newspaper не входят в замер
+            asyncio.run(extraction_rate(pages[:workers], executor))
+            rate = asyncio.run(extraction_rate(pages, executor, args.news_parser))
+            print(f"processes x{workers}: {rate:.1f} статей/с")
+
+
+class TimedParser(Parser):
+    """Parser, замеряющий время обработки каждой записи ленты."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    async def _parse_entry(self, url: str, entry, resource: str):
+        start = time.perf_counter()
+        try:
+            return await super()._parse_entry(url, entry, resource)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+async def record(conf: dict, args):
+    fixtures = FixtureStore(args.fixtures)
+    resources = {name: resource for name, resource in conf["parser"]["resources"].items()
+                 if not args.resources or name in args.resources}
+    fetcher = RecordingFetcher(
+        fixtures,
+        headers=conf["parser"]["headers"],
+        timeout=conf["parser"].get("request_timeout", 30),
+        max_in_flight=conf["parser"].get("max_in_flight"),
+    )
+    parser = Parser(
+        headers=conf["parser"]["headers"],
+        resources=resources,
+        fetcher=fetcher,
+        rate_limiter=DomainRateLimiter(conf["parser"].get("rate_limit")),
+    )
+    await fetcher.start()
+    try:
+        results = await asyncio.gather(*(parser.get_news(name, limit=args.limit) for name in resources),
+                                       return_exceptions=True)
+    finally:
+        await fetcher.close()
+        fixtures.flush()
+    for name, result in zip(resources, results):
+        print(f"{name}: {'ошибка ' + str(result) if isinstance(result, Exception) else f'{len(result)} статей'}")
+    print(f"Записано ответов: {len(fixtures.index)} в {args.fixtures}")
+
+
+async def ingest_run(conf: dict, fixtures: FixtureStore, args, concurrency: int, workers: int) -> dict:
+    resources = {name: {k: v for k, v in resource.items() if k != "rate_limit"}
+                 for name, resource in conf["parser"]["resources"].items() if resource.get("rss") in fixtures.index}
+    server = ReplayServer(fixtures, latency=args.latency, jitter=args.jitter)
+    await server.start()
+    fetcher = ReplayFetcher(server.base_url, headers=conf["parser"]["headers"], max_in_flight=concurrency)
+    await fetcher.start()
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) \
+        if workers else None
+    parser = TimedParser(
+        resources=resources,
+        fetcher=fetcher,
+        rate_limiter=DomainRateLimiter({"rps": args.rps, "burst": concurrency, "concurrency": concurrency}),
+        extraction_executor=executor,
+    )
+    try:
+        if executor:
+            # прогрев: запуск процессов и импорт newspaper не входят в замер
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(executor, extract_article, "https://example.com", b"<html></html>")
+                                   for _ in range(workers)))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(parser.get_news(name, limit=args.limit) for name in resources),
+                                       return_exceptions=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        await fetcher.close()
+        await server.stop()
+        if executor:
+            executor.shutdown()
+
+    latencies = parser.latencies or [0.0]
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "articles": sum(len(result) for result in results if isinstance(result, list)),
+        "elapsed": elapsed,
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+    }
+
+
+def ingest_setting(conf: dict, args, concurrency: int, workers: int) -> dict:
+    """Один замер в отдельном процессе, чтобы пиковый RSS относился только к нему."""
+    stats = asyncio.run(ingest_run(conf, FixtureStore(args.fixtures), args, concurrency, workers))
+    # ru_maxrss в КБ на Linux; для пула процессов учитываем самый тяжёлый дочерний процесс этого замера
+    stats["peak_rss"] = (getrusage(RUSAGE_SELF).ru_maxrss + getrusage(RUSAGE_CHILDREN).ru_maxrss) / 1024
+    return stats
+
+
+def bench_ingest(conf: dict, args):
+    fixtures = FixtureStore(args.fixtures)
+    print(f"Ответов в записи: {len(fixtures.index)}, задержка {args.latency} ± {args.jitter} с")
+    print(f"{'concurrency':>11} {'workers':>7} {'статей':>6} {'статей/с':>8} {'p50, с':>7} {'p95, с':>7} {'peak RSS, МБ':>12}")
+    for workers in args.workers:
+        for concurrency in args.concurrency:
+            # ru_maxrss — максимум за жизнь процесса, поэтому каждый замер идёт в свежем процессе
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as runner:
+                stats = runner.submit(ingest_setting, conf, args, concurrency, workers).result()
+            print(f"{concurrency:>11} {workers:>7} {stats['articles']:>6} "
+                  f"{stats['articles'] / stats['elapsed']:>8.1f} {stats['p50']:>7.2f} {stats['p95']:>7.2f} "
+                  f"{stats['peak_rss']:>12.1f}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Бенчмарки парсера")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    extraction = commands.add_parser("extraction", help="скорость извлечения статей в зависимости от числа процессов")
+    extraction.add_argument("--html-dir", help="каталог с HTML-страницами; по умолчанию синтетические статьи")
+    extraction.add_argument("--articles", type=int, default=200, help="число синтетических статей")
+    extraction.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    extraction.add_argument("--news-parser", help="экстрактор сайта из extractors.NEWS_PARSERS вместо newspaper")
+
+    record_parser = commands.add_parser("record", help="записать ленты и статьи из config.json в архив ответов")
+    record_parser.add_argument("--fixtures", required=True)
+    record_parser.add_argument("--resources", nargs="*", help="имена ресурсов; по умолчанию все")
+    record_parser.add_argument("--limit", type=int, default=10)
+    record_parser.add_argument("--config", default="config.json")
+
+    ingest = commands.add_parser("ingest", help="сквозной прогон Parser.get_news по записанным ответам")
+    ingest.add_argument("--fixtures", required=True)
+    ingest.add_argument("--latency", type=float, default=0.1, help="задержка ответа сервера, с")
+    ingest.add_argument("--jitter", type=float, default=0.05)
+    ingest.add_argument("--concurrency", type=int, nargs="+", default=[2, 8, 32])
+    ingest.add_argument("--workers", type=int, nargs="+", default=[0], help="0 — извлечение в потоках")
+    ingest.add_argument("--rps", type=float, default=1000, help="лимит запросов в секунду на домен")
+    ingest.add_argument("--limit", type=int, default=10)
+    ingest.add_argument("--config", default="config.json")
+
+    args = arg_parser.parse_args()
+    if args.command == "extraction":
+        bench_extraction(args)
+    else:
+        with open(args.config, "r", encoding="utf-8") as file:
+            conf = json.load(file)
+        if args.command == "record":
+            asyncio.run(record(conf, args))
+        else:
+            bench_ingest(conf, args)
@@ -0,0 +1,96 @@
+import calendar
+import logging
+import threading
+from dedupe import normalize_url
+from state import RedisStateStore
+
+logger = logging.getLogger(__name__)
+
+
+def entry_timestamp(entry) -> int | None:
+    published = entry.get("published_parsed") or entry.get("updated_parsed")
+    return calendar.timegm(published) if published else None
+
+
+class FeedCheckpoints:
+    """Отметка прогресса по каждой ленте: последние обработанные ссылки и
+    время самой свежей обработанной записи.
+
+    Записи перебираются от новых к старым, перебор останавливается на первой
+    известной ссылке или записи старше отметки, поэтому стоимость опроса
+    пропорциональна числу новых записей, а не размеру ленты. Запись, которая
+    не обработалась max_failures опросов подряд, считается обработанной,
+    чтобы не держать отметку и не скачиваться на каждом опросе.
+    """
+
+    def __init__(self, store: RedisStateStore, keep: int = 50, max_failures: int = 3):
+        self.store = store
+        self.keep = keep
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def new_urls(self, resource: str, entries: dict) -> list[str]:
+        """Возвращает ссылки записей новее отметки, от новых к старым."""
+        checkpoint = self.store.get(resource)
+        known = set(checkpoint.get("ids", []))
+        latest = checkpoint.get("latest")
+
+        ordered = list(entries.items())
+        timestamps = {url: entry_timestamp(entry) for url, entry in ordered}
+        if all(timestamps.values()):
+            ordered.sort(key=lambda item: timestamps[item[0]], reverse=True)
+
+        urls = []
+        for url, _ in ordered:
+            timestamp = timestamps[url]
+            if normalize_url(url) in known or (latest and timestamp and timestamp < latest):
+                break
+            urls.append(url)
+        return urls
+
+    def stage(self, resource: str, entries: dict, failed: set = frozenset()):
+        """Запоминает выбранные записи (от новых к старым) и неудачные среди них до commit()."""
+        with self._lock:
+            if entries:
+                self._pending[resource] = (entries, set(failed))
+            else:
+                self._pending.pop(resource, None)
+
+    def discard(self, resource: str):
+        with self._lock:
+            self._pending.pop(resource, None)
+
+    def commit(self, resource: str):
+        """Фиксирует записи старше самой старой неудачной.
+
+        Более новые не фиксируются: иначе перебор в new_urls остановился бы
+        на них и неудачная запись больше не попала бы в выборку. Исключение —
+        записи, исчерпавшие max_failures попыток.
+        """
+        with self._lock:
+            pending = self._pending.pop(resource, None)
+        if not pending:
+            return
+        entries, failed = pending
+        checkpoint = self.store.get(resource)
+
+        # счётчики хранятся только для записей, неудачных в этом запуске: «подряд»
+        previous = checkpoint.get("failures", {})
+        failures = {normalize_url(url): previous.get(normalize_url(url), 0) + 1 for url in failed}
+        retry = {url for url in failed if failures[normalize_url(url)] < self.max_failures}
+        for url in failed - retry:
+            logger.warning(f"{resource}: entry {url} failed {failures[normalize_url(url)]} times in a row, "
+                           f"marking it as processed")
+
+        urls = list(entries)
+        retry_positions = [i for i, url in enumerate(urls) if url in retry]
+        if retry_positions:
+            entries = {url: entries[url] for url in urls[retry_positions[-1] + 1:]}
+        timestamps = [ts for ts in map(entry_timestamp, entries.values()) if ts]
+        ids = [normalize_url(url) for url in entries] + checkpoint.get("ids", [])
+        self.store.set(resource, {
+            "ids": list(dict.fromkeys(ids))[:self.keep],
+            "latest": max(timestamps + [checkpoint.get("latest") or 0]) or None,
+            "failures": failures,
+        })
@@ -0,0 +1,104 @@
+import os
+import time
+import uuid
+import socket
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseManager:
+    """Распределение ресурсов между репликами парсера через аренды в Redis.
+
+    Каждая реплика раз в несколько секунд вызывает tick(): отмечает себя в
+    zset живых реплик `<prefix>replicas` и по rendezvous-хешу определяет
+    свою долю ресурсов. Ресурс опрашивает только владелец аренды
+    `<prefix><resource>` (SET NX PX), аренда продлевается каждым tick() и
+    сама истекает через ttl, если реплика умерла. Чужие ресурсы
+    освобождаются только когда по ним нет активного запуска, поэтому две
+    реплики никогда не опрашивают один ресурс одновременно.
+    """
+
+    def __init__(self, redis_client, resources: list[str], ttl: float = 30, replica_id: str = None,
+                 prefix: str = "parser:lease:"):
+        self.redis_client = redis_client
+        self.resources = list(resources)
+        self.ttl = ttl
+        self.replica_id = replica_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.prefix = prefix
+        self.replicas_key = prefix + "replicas"
+        self.owned: set[str] = set()
+        self._renew = redis_client.register_script(RENEW_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+
+    def key(self, resource: str) -> str:
+        return self.prefix + resource
+
+    def heartbeat(self) -> list[str]:
+        """Отмечает реплику живой и возвращает список живых реплик."""
+        now = time.time()
+        pipe = self.redis_client.pipeline()
+        pipe.zadd(self.replicas_key, {self.replica_id: now})
+        pipe.zremrangebyscore(self.replicas_key, "-inf", now - self.ttl)
+        pipe.zrange(self.replicas_key, 0, -1)
+        return pipe.execute()[-1]
+
+    def assignment(self, replicas: list[str]) -> set[str]:
+        """Ресурсы, которые по rendezvous-хешу достаются этой реплике."""
+        def weight(replica, resource):
+            return hashlib.sha1(f"{replica}|{resource}".encode("utf-8")).digest()
+
+        return {
+            resource for resource in self.resources
+            if max(replicas, key=lambda replica: weight(replica, resource)) == self.replica_id
+        }
+
+    def tick(self, busy: set[str] = frozenset()) -> set[str]:
+        """Продлевает, захватывает и отдаёт аренды; возвращает ресурсы, которыми реплика владеет."""
+        replicas = self.heartbeat()
+        if self.replica_id not in replicas:
+            replicas.append(self.replica_id)
+        wanted = self.assignment(replicas)
+        ttl_ms = int(self.ttl * 1000)
+
+        for resource in list(self.owned):
+            if resource not in wanted and resource not in busy:
+                self._release(keys=[self.key(resource)], args=[self.replica_id])
+                self.owned.discard(resource)
+                logger.info(f"Lease on {resource} handed over to another replica")
+            elif not self._renew(keys=[self.key(resource)], args=[self.replica_id, ttl_ms]):
+                self.owned.discard(resource)
+                logger.warning(f"Lease on {resource} expired before renewal")
+
+        for resource in wanted - self.owned:
+            key = self.key(resource)
+            # аренда могла остаться от прошлого tick(), если связь с Redis пропадала
+            if self.redis_client.set(key, self.replica_id, nx=True, px=ttl_ms) or \
+                    self._renew(keys=[key], args=[self.replica_id, ttl_ms]):
+                self.owned.add(resource)
+                logger.info(f"Lease on {resource} acquired by {self.replica_id}")
+        return set(self.owned)
+
+    def owns(self, resource: str) -> bool:
+        return resource in self.owned
+
+    def release_all(self):
+        for resource in self.owned:
+            self._release(keys=[self.key(resource)], args=[self.replica_id])
+        self.owned.clear()
+        self.redis_client.zrem(self.replicas_key, self.replica_id)
@@ -0,0 +1,129 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+TRACKING_PARAMS = ("utm_", "yclid", "gclid", "fbclid", "from", "rss")
+
+
+def normalize_url(url: str) -> str:
+    """Приводит ссылку на статью к каноническому виду: без схемы http/https,
+    www, фрагмента, завершающего слэша и трекинговых параметров."""
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower().removeprefix("www.")
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit(("", netloc, path, query, ""))
+
+
+def entry_url(entry) -> str:
+    return entry.get("link") or entry.get("id") or ""
+
+
+class SeenUrlIndex:
+    """Индекс уже обработанных ссылок RSS-записей в Redis.
+
+    Проверяется до скачивания статьи, поэтому известные записи не
+    загружаются повторно. Ключи живут ttl секунд.
+    """
+
+    def __init__(self, redis_client, ttl: int = None, prefix: str = "parser:seen:"):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def key(self, url: str) -> str:
+        return self.prefix + hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+
+    def filter_unseen(self, urls: list[str]) -> list[str]:
+        if not urls:
+            return []
+        pipe = self.redis_client.pipeline(transaction=False)
+        for url in urls:
+            pipe.exists(self.key(url))
+        return [url for url, seen in zip(urls, pipe.execute()) if not seen]
+
+    def mark_seen(self, urls: list[str]):
+        if not urls:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for url in urls:
+            pipe.set(self.key(url), 1, ex=self.ttl)
+        pipe.execute()
+
+
+class NewsStore:
+    """Запись сырых новостей в Redis для AImanager с ограниченным окном дедупликации.
+
+    Для каждой новости хранятся два ключа с TTL: компактный отпечаток
+    заголовка `parser:fp:<hash>` живёт retention секунд и отсекает дубликаты,
+    полезная нагрузка `parser:news:<hash>` живёт payload_ttl секунд — этого
+    достаточно, чтобы AImanager её забрал. Обе записи делает один
+    Lua-скрипт, а вся лента уходит одним пайплайном.
+    """
+
+    FINGERPRINT_PREFIX = "parser:fp:"
+    PAYLOAD_PREFIX = "parser:news:"
+
+    ADD_SCRIPT = """
+    if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+        redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, redis_client, retention: int, payload_ttl: int):
+        self.redis_client = redis_client
+        self.retention = retention
+        self.payload_ttl = payload_ttl
+        self._add = redis_client.register_script(self.ADD_SCRIPT)
+
+    @staticmethod
+    def fingerprint(header: str) -> str:
+        normalized = " ".join(header.lower().split())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+    def payload_key(self, header: str) -> str:
+        return self.PAYLOAD_PREFIX + self.fingerprint(header)
+
+    def add_new(self, items: list[tuple[str, str]]) -> list[str]:
+        """Сохраняет пары (заголовок, JSON) и возвращает заголовки, которых ещё не было в окне."""
+        if not items:
+            return []
+        pipe = self.redis_client.pipeline(transaction=False)
+        for header, payload in items:
+            self._add(
+                keys=[self.FINGERPRINT_PREFIX + self.fingerprint(header), self.payload_key(header)],
+                args=[self.retention, payload, self.payload_ttl],
+                client=pipe,
+            )
+        return [header for (header, _), created in zip(items, pipe.execute()) if created]
+
+    def remove(self, headers: list[str]):
+        keys = []
+        for header in headers:
+            keys += [self.FINGERPRINT_PREFIX + self.fingerprint(header), self.payload_key(header)]
+        if keys:
+            self.redis_client.delete(*keys)
+
+
+def memory_report(redis_client, prefixes: list[str], sample: int = 200) -> dict:
+    """Число ключей и оценка занимаемой памяти для каждого префикса.
+
+    Память оценивается по MEMORY USAGE первых sample ключей.
+    """
+    report = {}
+    for prefix in prefixes:
+        count, sampled, sampled_bytes = 0, 0, 0
+        for key in redis_client.scan_iter(match=prefix + "*", count=1000):
+            count += 1
+            if sampled < sample:
+                sampled_bytes += redis_client.memory_usage(key) or 0
+                sampled += 1
+        report[prefix] = {
+            "keys": count,
+            "estimated_bytes": round(sampled_bytes / sampled * count) if sampled else 0,
+        }
+    return report
@@ -0,0 +1,149 @@
+import re
+import logging
+from newspaper import Article
+from datetime import datetime
+from extractors import NEWS_PARSERS
+
+logger = logging.getLogger(__name__)
+
+
+def extract_article(url: str, html: bytes = None, news_parser: str = None, charset: str = None):
+    """Извлекает заголовок, текст и дату статьи.
+
+    Функция модульного уровня, чтобы её можно было выполнять в пуле процессов:
+    туда передаются только url, байты HTML, имя экстрактора сайта и
+    кодировка из Content-Type (без неё кодировка определяется по meta).
+    """
+    logger.debug(f"Synchronous parsing of article: {url}")
+    if news_parser and html:
+        article_data = _extract_with_site_parser(url, html, news_parser, charset)
+        if article_data:
+            return article_data
+
+    try:
+        article = Article(url)
+        article.download(input_html=_decode(html, charset))
+        article.parse()
+
+        if 'Доступ к чату заблокирован' in article.html:
+            logger.error("Block detected for URL %s: Chat access blocked", url)
+            return None
+
+        if not article.title or not article.text:
+            logger.warning(f"Article {url} has no title or text")
+            return None
+
+        publish_date = extract_publication_date(article, url)
+        logger.debug(f"Extracted publication date {publish_date} for article {url}")
+        return {
+            'header': article.title,
+            'text': article.text,
+            'date': publish_date
+        }
+
+    except Exception as e:
+        logger.error(f"Error in synchronous parsing of {url}: {str(e)}", exc_info=True)
+        return None
+
+
+def _decode(html: bytes, charset: str):
+    if not html or not charset:
+        return html
+    try:
+        return html.decode(charset, errors='replace')
+    except LookupError:
+        return html
+
+
+def _extract_with_site_parser(url: str, html: bytes, news_parser: str, charset: str = None):
+    extractor = NEWS_PARSERS.get(news_parser)
+    if extractor is None:
+        logger.warning(f"Unknown news_parser '{news_parser}' for {url}, using newspaper")
+        return None
+    try:
+        article_data = extractor.extract(html, charset)
+    except Exception as e:
+        logger.warning(f"Site parser '{news_parser}' failed for {url}: {e}")
+        return None
+    if not article_data:
+        logger.debug(f"Site parser '{news_parser}' found nothing in {url}, using newspaper")
+        return None
+    article_data['date'] = article_data['date'] or _extract_date_from_url(url) or datetime.now()
+    return article_data
+
+
+def extract_publication_date(article, url: str) -> datetime:
+    if article.publish_date:
+        return article.publish_date
+
+    meta_date = _extract_date_from_meta(article)
+    if meta_date:
+        return meta_date
+
+    url_date = _extract_date_from_url(url)
+    if url_date:
+        return url_date
+
+    return datetime.now()
+
+
+def _extract_date_from_meta(article):
+    try:
+        if hasattr(article, 'meta_data') and article.meta_data:
+            meta = article.meta_data
+            date_tags = [
+                'pubdate', 'publish_date', 'article:published_time',
+                'date', 'og:published_time', 'publication_date'
+            ]
+
+            for tag in date_tags:
+                if tag in meta:
+                    date_str = meta[tag]
+                    parsed_date = _parse_date_string(date_str)
+                    if parsed_date:
+                        return parsed_date
+    except Exception:
+        pass
+    return None
+
+
+def _extract_date_from_url(url: str):
+    try:
+        patterns = [
+            r'/(\d{4})/(\d{2})/(\d{2})/',
+            r'/(\d{4})-(\d{2})-(\d{2})/',
+            r'/(\d{2})\.(\d{2})\.(\d{4})/',
+            r'_(\d{4})(\d{2})(\d{2})',
+        ]
+
+        for pattern in patterns:
+            match = re.search(pattern, url)
+            if match:
+                groups = match.groups()
+                if len(groups) == 3:
+                    year, month, day = map(int, groups)
+                    return datetime(year, month, day)
+    except Exception:
+        pass
+    return None
+
+
+def _parse_date_string(date_str: str):
+    if not date_str:
+        return None
+
+    formats = [
+        '%Y-%m-%d %H:%M:%S',
+        '%Y-%m-%dT%H:%M:%S',
+        '%Y-%m-%dT%H:%M:%SZ',
+        '%d.%m.%Y %H:%M',
+        '%Y-%m-%d',
+        '%d/%m/%Y',
+    ]
+
+    for fmt in formats:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
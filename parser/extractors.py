@@ -0,0 +1,79 @@
+import lxml.html
+from lxml.etree import XPath
+from datetime import datetime
+from urllib.parse import urljoin
+
+DEFAULT_TITLE = '//meta[@property="og:title"]/@content | //h1'
+DEFAULT_DATE = '//meta[@property="article:published_time"]/@content | //time/@datetime'
+
+
+def parse_html(html: bytes, charset: str = None):
+    try:
+        parser = lxml.html.HTMLParser(encoding=charset) if charset else None
+    except LookupError:
+        parser = None
+    return lxml.html.fromstring(html, parser=parser)
+
+
+class SiteExtractor:
+    """Быстрое извлечение статьи конкретного сайта по заранее скомпилированным XPath.
+
+    Выбирается полем news_parser ресурса в config.json. Если селекторы ничего
+    не нашли, extract возвращает None и используется newspaper.
+    """
+
+    def __init__(self, body: str, title: str = DEFAULT_TITLE, date: str = DEFAULT_DATE):
+        self.body = XPath(body)
+        self.title = XPath(title)
+        self.date = XPath(date)
+
+    def extract(self, html: bytes, charset: str = None) -> dict | None:
+        document = parse_html(html, charset)
+        title = self._first_text(self.title(document))
+        paragraphs = (" ".join(element.text_content().split()) for element in self.body(document))
+        text = "\n".join(paragraph for paragraph in paragraphs if paragraph)
+        if not title or not text:
+            return None
+        return {'header': title, 'text': text, 'date': self._parse_date(self._first_text(self.date(document)))}
+
+    @staticmethod
+    def _first_text(nodes) -> str:
+        for node in nodes:
+            value = node if isinstance(node, str) else node.text_content()
+            value = " ".join(value.split())
+            if value:
+                return value
+        return ""
+
+    @staticmethod
+    def _parse_date(value: str):
+        try:
+            return datetime.fromisoformat(value) if value else None
+        except ValueError:
+            return None
+
+
+class LinkExtractor:
+    """Ссылки на статьи со страницы-ленты для ресурсов без RSS (поле url_parser)."""
+
+    def __init__(self, links: str):
+        self.links = XPath(links)
+
+    def extract(self, html: bytes, base_url: str, charset: str = None) -> list[str]:
+        document = parse_html(html, charset)
+        return list(dict.fromkeys(urljoin(base_url, href.strip()) for href in self.links(document) if href.strip()))
+
+
+NEWS_PARSERS = {
+    "rbc": SiteExtractor(body='//div[contains(@class, "article__text")]//p'),
+    "ria": SiteExtractor(body='//div[contains(@class, "article__text")]'),
+    "lenta": SiteExtractor(body='//div[contains(@class, "topic-body__content")]//p'),
+    "tass": SiteExtractor(body='//article//p'),
+    "interfax": SiteExtractor(body='//article[@itemprop="articleBody"]/p'),
+    "kommersant": SiteExtractor(body='//div[contains(@class, "doc__body")]//p[contains(@class, "doc__text")]'),
+}
+
+URL_PARSERS = {
+    "rbc": LinkExtractor('//a[contains(@class, "news-feed__item")]/@href'),
+    "ria": LinkExtractor('//a[contains(@class, "list-item__title")]/@href'),
+}
@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from fetcher import FetchResult
+from state import RedisStateStore
+
+logger = logging.getLogger(__name__)
+
+
+class FeedCache:
+    """Валидаторы RSS-лент (ETag, Last-Modified, хеш тела) для условных запросов.
+
+    Попадание — ответ 304 или тело, совпавшее с предыдущим: лента не
+    обрабатывается. Промах — лента изменилась и разбирается заново.
+    """
+
+    def __init__(self, store: RedisStateStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "not_modified": 0, "bytes_saved": 0})
+        self._pending = {}
+
+    def request_headers(self, resource: str) -> dict:
+        validators = self.store.get(resource)
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def is_modified(self, resource: str, response: FetchResult) -> bool:
+        validators = self.store.get(resource)
+        if response.status == 304:
+            self._count(resource, hit=True, not_modified=True, bytes_saved=validators.get("size", 0))
+            logger.info(f"Feed {resource} not modified (304)")
+            return False
+
+        if response.ok and validators.get("hash") == self._digest(response.body):
+            self._count(resource, hit=True)
+            logger.info(f"Feed {resource} body is unchanged, skipping")
+            return False
+
+        self._count(resource, hit=False)
+        return True
+
+    def stage(self, resource: str, response: FetchResult):
+        with self._lock:
+            self._pending[resource] = {
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "hash": self._digest(response.body),
+                "size": len(response.body),
+            }
+
+    def commit(self, resource: str):
+        """Сохраняет валидаторы ленты только после того, как её новости записаны."""
+        with self._lock:
+            validators = self._pending.pop(resource, None)
+        if validators:
+            self.store.set(resource, validators)
+
+    def discard(self, resource: str):
+        """Забывает валидаторы неудачного запуска, чтобы их не зафиксировал следующий."""
+        with self._lock:
+            self._pending.pop(resource, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {resource: dict(counters) for resource, counters in self._stats.items()}
+
+    def _count(self, resource: str, hit: bool, not_modified: bool = False, bytes_saved: int = 0):
+        with self._lock:
+            counters = self._stats[resource]
+            counters["hits" if hit else "misses"] += 1
+            counters["not_modified"] += int(not_modified)
+            counters["bytes_saved"] += bytes_saved
+
+    @staticmethod
+    def _digest(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()
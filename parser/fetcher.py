@@ -0,0 +1,143 @@
+import time
+import asyncio
+import logging
+import aiohttp
+import requests
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+CHUNK_SIZE = 64 * 1024
+
+
+class FetchAborted(Exception):
+    """Загрузка прервана: превышен размер, истёк срок или неподходящий Content-Type."""
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    headers: dict = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def charset(self) -> str | None:
+        for param in self.headers.get("content-type", "").split(";")[1:]:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "charset" and value.strip():
+                return value.strip().strip('"')
+        return None
+
+
+class Fetcher:
+    """HTTP-клиент парсера.
+
+    После start() все запросы идут через одну общую aiohttp-сессию текущего
+    event loop, а число одновременных запросов ограничено max_in_flight.
+    Без start() (потоковый режим) запрос выполняется через requests в executor.
+
+    Тело читается потоково (gzip/deflate/brotli распаковываются на лету) и
+    не может превысить max_bytes, а весь запрос — deadline секунд.
+    """
+
+    def __init__(self, headers: dict = None, timeout: float = 30, max_in_flight: int = None,
+                 max_bytes: int = None):
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.max_bytes = max_bytes
+        self.session: aiohttp.ClientSession | None = None
+        self._in_flight: asyncio.Semaphore | None = None
+
+    async def start(self):
+        if self.session is not None:
+            return
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        if self.max_in_flight:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        logger.info(f"HTTP session started, max in-flight requests: {self.max_in_flight or 'unlimited'}")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+        self.session = None
+        self._in_flight = None
+
+    async def fetch(self, url: str, headers: dict = None, max_bytes: int = None, deadline: float = None,
+                    accept_types: tuple[str, ...] = None) -> FetchResult:
+        limits = (max_bytes or self.max_bytes, deadline or self.timeout, accept_types)
+        if self.session is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._fetch_sync, url, headers, *limits)
+
+        if self._in_flight is None:
+            return await self._fetch_async(url, headers, *limits)
+        async with self._in_flight:
+            return await self._fetch_async(url, headers, *limits)
+
+    async def _fetch_async(self, url: str, headers: dict, max_bytes: int, deadline: float,
+                           accept_types: tuple[str, ...]) -> FetchResult:
+        logger.debug(f"GET {url}")
+        try:
+            async with asyncio.timeout(deadline):
+                async with self.session.get(url, headers=headers) as response:
+                    self._check_headers(url, response.status, response.headers, max_bytes, accept_types)
+                    body = bytearray()
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        body += chunk
+                        self._check_size(url, len(body), max_bytes)
+                    return FetchResult(
+                        url=str(response.url),
+                        status=response.status,
+                        headers={k.lower(): v for k, v in response.headers.items()},
+                        body=bytes(body),
+                    )
+        except TimeoutError:
+            raise FetchAborted(f"{url}: не уложились в {deadline} с")
+
+    def _fetch_sync(self, url: str, headers: dict, max_bytes: int, deadline: float,
+                    accept_types: tuple[str, ...]) -> FetchResult:
+        logger.debug(f"GET {url} (sync)")
+        started = time.monotonic()
+        # таймаут requests — на соединение и на каждое чтение, общий срок проверяется по ходу чтения
+        with requests.get(url, headers={**self.headers, **(headers or {})}, timeout=min(self.timeout, deadline),
+                          stream=True) as response:
+            self._check_headers(url, response.status_code, response.headers, max_bytes, accept_types)
+            body = bytearray()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                body += chunk
+                self._check_size(url, len(body), max_bytes)
+                if time.monotonic() - started > deadline:
+                    raise FetchAborted(f"{url}: не уложились в {deadline} с")
+            return FetchResult(
+                url=response.url,
+                status=response.status_code,
+                headers={k.lower(): v for k, v in response.headers.items()},
+                body=bytes(body),
+            )
+
+    @staticmethod
+    def _check_headers(url: str, status: int, headers, max_bytes: int, accept_types: tuple[str, ...]):
+        if not 200 <= status < 300:
+            return
+        content_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if accept_types and content_type and content_type not in accept_types:
+            raise FetchAborted(f"{url}: неподходящий Content-Type {content_type}")
+        # Content-Length относится к сжатому телу, поэтому итоговый размер всё равно проверяется при чтении
+        content_length = headers.get("Content-Length")
+        if max_bytes and content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise FetchAborted(f"{url}: Content-Length {content_length} больше {max_bytes} байт")
+
+    @staticmethod
+    def _check_size(url: str, size: int, max_bytes: int):
+        if max_bytes and size > max_bytes:
+            raise FetchAborted(f"{url}: тело больше {max_bytes} байт")
@@ -1,14 +1,34 @@
+import os
 import time
+import argparse
 import json
 import random
 import asyncio
 import schedule
 import threading
+import functools
+import multiprocessing
 import redis
-import pika
 from fake_useragent import UserAgent
 from datetime import datetime
-from parser import Parser
+from concurrent.futures import ProcessPoolExecutor
+from parser import Parser, TgParser
+from fetcher import Fetcher
+from feed_cache import FeedCache
+from state import RedisStateStore
+from dedupe import SeenUrlIndex, NewsStore, memory_report
+from publisher import RabbitPublisher, PublishError
+from rate_limiter import DomainRateLimiter
+from scheduler import AdaptiveSchedule
+from checkpoint import FeedCheckpoints
+from archive import HtmlArchive, reextract_path
+from near_dup import NearDuplicateIndex
+from coordination import LeaseManager
+from backpressure import Backpressure
+from metrics import IngestionMetrics
+
+KEEPALIVE_INTERVAL = 30
+
 
 class RunParser:
     def __init__(self, conf: dict, random_user_agent: bool = True):
@@ -16,32 +36,107 @@ class RunParser:
         self.conf['parser']['headers']['User-Agent'] = UserAgent().random if random_user_agent \
             else self.conf['parser']['headers']['User-Agent']
 
+        self.redis_client = create_redis_client(self.conf)
+
+        self.feed_cache = FeedCache(RedisStateStore(self.redis_client, "feed_cache"))
+        self.checkpoints = FeedCheckpoints(
+            RedisStateStore(self.redis_client, "checkpoints"),
+            max_failures=self.conf["parser"].get("max_entry_failures", 3),
+        )
+        dedupe_conf = self.conf["parser"].get("dedupe", {})
+        self.seen_index = SeenUrlIndex(
+            self.redis_client,
+            ttl=dedupe_conf.get("seen_url_retention_days", 7) * 24 * 3600,
+        )
+        self.news_store = NewsStore(
+            self.redis_client,
+            retention=dedupe_conf.get("retention_days", 14) * 24 * 3600,
+            payload_ttl=dedupe_conf.get("payload_ttl_hours", 48) * 3600,
+        )
+        near_dup_conf = self.conf["parser"].get("near_duplicates", {})
+        self.near_dup_action = near_dup_conf.get("action", "drop")
+        self.near_duplicates = NearDuplicateIndex(
+            self.redis_client,
+            window=near_dup_conf.get("window_hours", 24) * 3600,
+            threshold=near_dup_conf.get("threshold", 0.6),
+        ) if near_dup_conf.get("enabled") else None
+        self.fetcher = Fetcher(
+            headers=self.conf["parser"]["headers"],
+            timeout=self.conf["parser"].get("request_timeout", 30),
+            max_in_flight=self.conf["parser"].get("max_in_flight"),
+            max_bytes=self.conf["parser"].get("max_feed_bytes"),
+        )
+        extraction_workers = self.conf["parser"].get("extraction_workers", 0)
+        self.extraction_executor = ProcessPoolExecutor(
+            max_workers=extraction_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) if extraction_workers else None
+        archive_conf = self.conf["parser"].get("archive", {})
+        self.archive = HtmlArchive(archive_conf["path"], archive_conf.get("level", 3)) \
+            if archive_conf.get("enabled") else None
+        self.metrics = IngestionMetrics()
         self.parser: Parser = Parser(
             headers=self.conf["parser"]["headers"],
             resources=self.conf["parser"]["resources"],
+            fetcher=self.fetcher,
+            feed_cache=self.feed_cache,
+            seen_index=self.seen_index,
+            rate_limiter=DomainRateLimiter(self.conf["parser"].get("rate_limit")),
+            extraction_executor=self.extraction_executor,
+            checkpoints=self.checkpoints,
+            max_article_bytes=self.conf["parser"].get("max_article_bytes"),
+            article_deadline=self.conf["parser"].get("article_deadline"),
+            archive=self.archive,
+            metrics=self.metrics,
         )
 
-        self.redis_client = redis.StrictRedis(
-            host=self.conf["redis"]["host"],
-            port=self.conf["redis"]["port"],
-            db=self.conf["redis"].get("db", 0),
-            decode_responses=True
-        )
+        adaptive_conf = self.conf["parser"].get("adaptive_schedule", {})
+        self.schedule = AdaptiveSchedule(
+            RedisStateStore(self.redis_client, "schedule"),
+            base_interval=self.conf["parser"]["periodicity"] * 60,
+            min_interval=adaptive_conf.get("min_interval", 5) * 60,
+            max_interval=adaptive_conf.get("max_interval", 120) * 60,
+            target_items=adaptive_conf.get("target_items", 3),
+        ) if adaptive_conf.get("enabled") else None
 
-        self.rabbit_connection = pika.BlockingConnection(
-            pika.ConnectionParameters(
-                host=self.conf["rabbitmq"]["host"],
-                port=self.conf["rabbitmq"].get("port", 5672),
-                credentials=pika.PlainCredentials(
-                    self.conf["rabbitmq"]["user"],
-                    self.conf["rabbitmq"]["password"]
-                )
-            )
-        )
-        self.rabbit_channel = self.rabbit_connection.channel()
-        self.rabbit_channel.queue_declare(queue=self.conf["rabbitmq"]["queue"], durable=True)
+        coordination_conf = self.conf["parser"].get("coordination", {})
+        self.leases = LeaseManager(
+            self.redis_client,
+            list(self.parser.resources),
+            ttl=coordination_conf.get("lease_ttl", 30),
+        ) if coordination_conf.get("enabled") else None
+
+        self._in_progress = set()
+        self._next_run = {}
+        self._in_progress_lock = threading.Lock()
+        self._tasks = set()
+
+        self.publisher = RabbitPublisher(self.conf["rabbitmq"])
+        self.publisher.connect()
+
+        backpressure_conf = self.conf["parser"].get("backpressure", {})
+        self.backpressure = Backpressure(
+            self.publisher,
+            high_watermark=backpressure_conf.get("high_watermark", 500),
+            low_watermark=backpressure_conf.get("low_watermark"),
+            pause_watermark=backpressure_conf.get("pause_watermark"),
+            max_stretch=backpressure_conf.get("max_stretch", 4.0),
+            store=RedisStateStore(self.redis_client, "backpressure"),
+        ) if backpressure_conf.get("enabled") else None
+        self.backpressure_interval = backpressure_conf.get("check_interval", 15)
 
     def run(self):
+        metrics_conf = self.conf["parser"].get("metrics", {})
+        if metrics_conf.get("enabled"):
+            self.metrics.serve(metrics_conf.get("port", 9108), metrics_conf.get("addr", "0.0.0.0"))
+            print(f"[OK] Метрики Prometheus доступны на порту {metrics_conf.get('port', 9108)}")
+        if self.conf["parser"].get("mode", "threads") == "async":
+            try:
+                asyncio.run(self._run_ingestion_loop())
+            except KeyboardInterrupt:
+                print("Основная программа завершается.")
+            return
+
         scheduler_thread = threading.Thread(target=self._run_scheduler)
         scheduler_thread.daemon = True
         scheduler_thread.start()
@@ -54,53 +149,258 @@ class RunParser:
             schedule.clear()
 
     def _write_resource_news(self, resource):
+        if not self._allowed_by_backpressure(resource):
+            return
+        if not self._begin_run(resource):
+            print(f"[SKIP] {resource}: предыдущий запуск ещё не завершён")
+            return
         try:
-            rabbit_connection = pika.BlockingConnection(
-                pika.ConnectionParameters(
-                    host=self.conf["rabbitmq"]["host"],
-                    port=self.conf["rabbitmq"].get("port", 5672),
-                    credentials=pika.PlainCredentials(
-                        self.conf["rabbitmq"]["user"],
-                        self.conf["rabbitmq"]["password"]
-                    )
-                )
-            )
-            rabbit_channel = rabbit_connection.channel()
-            rabbit_channel.queue_declare(queue=self.conf["rabbitmq"]["queue"], durable=True)
-
             news = asyncio.run(self.parser.get_news(resource, limit=self.conf['parser']['news_limit']))
-            for n in news:
-                n["source"] = resource
-                n["source_type"] = "telegram" if "t.me" in n.get("url", "") else "rss"
-                header_key = n["header"]
+            self._store_news(resource, news)
+            self._log_feed_cache(resource)
+        except Exception as e:
+            self.parser.discard(resource)
+            self.metrics.errors.labels(resource, "ingest").inc()
+            raise Exception(f"write_resource_news:{resource}: {e}")
+        finally:
+            self._end_run(resource)
 
-                if self.redis_client.exists(header_key):
-                    print(f"[SKIP] {resource}: новость '{header_key}' уже существует в Redis, пропускаем")
-                    continue
+    async def _ingest_resource(self, resource):
+        try:
+            news = await self.parser.get_news(resource, limit=self.conf['parser']['news_limit'])
+            new_items = await asyncio.to_thread(self._store_news, resource, news)
+            self._log_feed_cache(resource)
+            if self.schedule:
+                interval = await asyncio.to_thread(self.schedule.observe, resource, new_items)
+                if self.backpressure:
+                    interval = self.backpressure.stretch(interval)
+                self._next_run[resource] = asyncio.get_running_loop().time() + interval
+        except Exception as e:
+            self.parser.discard(resource)
+            self.metrics.errors.labels(resource, "ingest").inc()
+            print(f"[ERR] {resource}: {e}")
+        finally:
+            self._end_run(resource)
+
+    def _store_news(self, resource, news, commit: bool = True):
+        items = []
+        for n in self._drop_near_duplicates(resource, news):
+            n["source"] = resource
+            n["source_type"] = "telegram" if "t.me" in n.get("url", "") else "rss"
+            items.append((n["header"], json.dumps(n, ensure_ascii=False, indent=4, default=json_serializer)))
 
-                news_json = json.dumps(n, ensure_ascii=False, indent=4, default=json_serializer)
-                self.redis_client.set(header_key, news_json)
+        new_headers = self.news_store.add_new(items)
+        for header in {header for header, _ in items} - set(new_headers):
+            self.metrics.dedupe_skips.labels(resource, "stored").inc()
+            print(f"[SKIP] {resource}: новость '{header}' уже существует в Redis, пропускаем")
+
+        try:
+            with self.metrics.publish_seconds.labels(resource).time():
+                self.publisher.publish([self.news_store.payload_key(header) for header in new_headers])
+        except PublishError as e:
+            # неотправленные новости не дойдут до AImanager: даём следующему запуску повторить их,
+            # подтверждённые брокером оставляем — их ключи AImanager уже может читать
+            self.metrics.errors.labels(resource, "publish").inc()
+            self.news_store.remove(new_headers[e.confirmed:])
+            raise
 
-                if self.redis_client.exists(header_key):
-                    rabbit_channel.basic_publish(
-                        exchange="",
-                        routing_key=self.conf["rabbitmq"]["queue"],
-                        body=header_key,
-                        properties=pika.BasicProperties(delivery_mode=2)
-                    )
-                    print(f"[OK] {resource}: новость '{header_key}' сохранена в Redis и отправлена в RabbitMQ")
-                else:
-                    print(f"[ERR] {resource}: не удалось сохранить новость '{header_key}' в Redis")
+        self.metrics.news_published.labels(resource).inc(len(new_headers))
+        for header in new_headers:
+            print(f"[OK] {resource}: новость '{header}' сохранена в Redis и отправлена в RabbitMQ")
+        self.seen_index.mark_seen([n["url"] for n in news])
+        if commit:
+            self.parser.commit(resource)
+        return len(new_headers)
+
+    def _drop_near_duplicates(self, resource, news):
+        if not self.near_duplicates:
+            return news
+        unique = []
+        for n in news:
+            original = self.near_duplicates.find_or_add(NewsStore.fingerprint(n["header"]), n.get("text", ""))
+            if original is None:
+                unique.append(n)
+            elif self.near_dup_action == "link":
+                n["duplicate_of"] = NewsStore.PAYLOAD_PREFIX + original
+                unique.append(n)
+            else:
+                self.metrics.dedupe_skips.labels(resource, "near_duplicate").inc()
+                print(f"[DUP] {resource}: новость '{n['header']}' повторяет {NewsStore.PAYLOAD_PREFIX + original}, пропускаем")
+        return unique
+
+    def _log_feed_cache(self, resource):
+        counters = self.feed_cache.stats().get(resource)
+        if counters:
+            self.metrics.observe_feed_cache(resource, counters)
+            print(f"[CACHE] {resource}: попаданий {counters['hits']}, промахов {counters['misses']}, "
+                  f"304: {counters['not_modified']}, сэкономлено {counters['bytes_saved']} байт")
+
+    def _begin_run(self, resource) -> bool:
+        with self._in_progress_lock:
+            if resource in self._in_progress:
+                return False
+            self._in_progress.add(resource)
+            return True
+
+    def _end_run(self, resource):
+        with self._in_progress_lock:
+            self._in_progress.discard(resource)
+
+    def _next_interval(self, resource) -> float:
+        if self.schedule:
+            interval = self.schedule.interval(resource)
+        else:
+            base_interval = self.conf['parser']['periodicity'] * 60
+            variance = base_interval * 0.3
+            interval = base_interval + random.uniform(-variance, variance)
+        return self.backpressure.stretch(interval) if self.backpressure else interval
 
-            rabbit_connection.close()
+    def _allowed_by_backpressure(self, resource) -> bool:
+        if not self.backpressure:
+            return True
+        priority = self.parser.resources.get(resource, {}).get("priority")
+        if self.backpressure.allows(priority):
+            return True
+        state = self.backpressure.state()
+        print(f"[THROTTLE] {resource}: очередь {state['depth']} сообщений, потребителей {state['consumers']}, "
+              f"опрос отложен")
+        return False
 
+    async def _update_backpressure(self):
+        previous = self.backpressure.state()["state"]
+        state = await asyncio.to_thread(self.backpressure.update)
+        self.metrics.observe_backpressure(state)
+        if state["state"] != previous:
+            print(f"[THROTTLE] {previous} -> {state['state']}: очередь {state['depth']} сообщений, "
+                  f"потребителей {state['consumers']}, интервалы x{state['stretch']:.1f}")
+
+    def _create_tg_parser(self):
+        tg_conf = self.conf["parser"].get("telegram", {})
+        api_id = os.environ.get("TELEGRAM_API_ID") or tg_conf.get("api_id")
+        api_hash = os.environ.get("TELEGRAM_API_HASH") or tg_conf.get("api_hash")
+        if not api_id or not api_hash:
+            return None
+        return TgParser(
+            int(api_id), api_hash,
+            phone=os.environ.get("TELEGRAM_PHONE") or tg_conf.get("phone"),
+            session=tg_conf.get("session", "session"),
+            state=RedisStateStore(self.redis_client, "telegram"),
+        )
+
+    async def _on_telegram_news(self, resource, news):
+        if self.leases and not self.leases.owns(resource):
+            return
+        try:
+            # min_id двигает только опрос канала, событие лишь ускоряет доставку
+            await asyncio.to_thread(self._store_news, resource, news, False)
         except Exception as e:
-            raise Exception(f"write_resource_news:{resource}: {e}")
+            self.metrics.errors.labels(resource, "telegram").inc()
+            print(f"[ERR] {resource}: {e}")
+
+    async def _start_telegram(self):
+        channels = {config["telegram"]: name for name, config in self.parser.resources.items() if "telegram" in config}
+        if not channels:
+            return
+        self.parser.tg_parser = self._create_tg_parser()
+        if self.parser.tg_parser is None:
+            print(f"[ERR] Telegram: не заданы api_id/api_hash, каналы {', '.join(channels.values())} пропускаются")
+            return
+        try:
+            await self.parser.tg_parser.start()
+        except Exception as e:
+            print(f"[ERR] Telegram: не удалось подключиться: {e}")
+            self.parser.tg_parser = None
+            return
+        if self.conf["parser"].get("telegram", {}).get("subscribe", True):
+            self.parser.tg_parser.subscribe(channels, self._on_telegram_news)
+
+    async def _refresh_leases(self, next_run):
+        previous = set(self.leases.owned)
+        with self._in_progress_lock:
+            busy = set(self._in_progress)
+        try:
+            owned = await asyncio.to_thread(self.leases.tick, busy)
+        except Exception as e:
+            # без связи с Redis аренды не подтвердить, поэтому опрос приостанавливается до восстановления
+            print(f"[ERR] Аренды ресурсов: {e}")
+            self.leases.owned.clear()
+            return
+        for resource in owned - previous:
+            if resource in next_run:
+                # отметка последнего опроса общая для реплик, поэтому новый владелец не опрашивает ресурс раньше срока
+                delay = await asyncio.to_thread(self.schedule.delay_until_due, resource) if self.schedule else 0
+                next_run[resource] = asyncio.get_running_loop().time() + delay
+        if owned != previous:
+            print(f"[LEASE] {self.leases.replica_id}: ресурсов {len(owned)} из {len(self.leases.resources)}: "
+                  f"{', '.join(sorted(owned)) or '—'}")
+
+    async def _run_ingestion_loop(self):
+        loop = asyncio.get_running_loop()
+        await self.fetcher.start()
+        await self._start_telegram()
+        try:
+            next_run = self._next_run
+            for resource, config in self.parser.resources.items():
+                if "telegram" in config and self.parser.tg_parser is None:
+                    continue
+                delay = await asyncio.to_thread(self.schedule.delay_until_due, resource) if self.schedule else 0
+                next_run[resource] = loop.time() + delay
+            last_keepalive = loop.time()
+            last_lease_tick = None
+            last_backpressure_check = None
+            while True:
+                now = loop.time()
+                if now - last_keepalive >= KEEPALIVE_INTERVAL:
+                    await asyncio.to_thread(self.publisher.keepalive)
+                    last_keepalive = now
+                if self.leases and (last_lease_tick is None or now - last_lease_tick >= self.leases.ttl / 3):
+                    await self._refresh_leases(next_run)
+                    last_lease_tick = now
+                if self.backpressure and (last_backpressure_check is None
+                                          or now - last_backpressure_check >= self.backpressure_interval):
+                    await self._update_backpressure()
+                    last_backpressure_check = now
+
+                for resource, due in list(next_run.items()):
+                    if due > now:
+                        continue
+                    if self.leases and not self.leases.owns(resource):
+                        continue
+                    if not self._allowed_by_backpressure(resource):
+                        # не откладываем на целый растянутый интервал: проверим снова после следующего замера очереди
+                        next_run[resource] = now + self.backpressure_interval
+                        continue
+                    next_run[resource] = now + await asyncio.to_thread(self._next_interval, resource)
+
+                    if not self._begin_run(resource):
+                        print(f"[SKIP] {resource}: предыдущий запуск ещё не завершён")
+                        continue
+                    task = asyncio.create_task(self._ingest_resource(resource))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+                await asyncio.sleep(1)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            if self.leases:
+                self.leases.release_all()
+            await self.fetcher.close()
+            if self.parser.tg_parser:
+                await self.parser.tg_parser.close()
+            self.publisher.close()
+            if self.extraction_executor:
+                self.extraction_executor.shutdown(cancel_futures=True)
 
     def _run_scheduler(self):
         base_interval = self.conf['parser']['periodicity']
+        if self.leases:
+            print("[SKIP] Координация реплик поддерживается только в режиме async, ресурсы опрашиваются без аренд")
         
-        for resource in self.parser.resources:
+        for resource, config in self.parser.resources.items():
+            if "telegram" in config:
+                print(f"[SKIP] {resource}: Telegram-каналы поддерживаются только в режиме async")
+                continue
             variance = base_interval * 0.3
             interval = base_interval + random.uniform(-variance, variance)
             
@@ -110,8 +410,17 @@ class RunParser:
             self._run_parser_in_thread(resource)
             schedule.every(round(interval)).minutes.do(job)
 
+        last_keepalive = time.monotonic()
+        last_backpressure_check = None
         while True:
+            if self.backpressure and (last_backpressure_check is None
+                                      or time.monotonic() - last_backpressure_check >= self.backpressure_interval):
+                self.metrics.observe_backpressure(self.backpressure.update())
+                last_backpressure_check = time.monotonic()
             schedule.run_pending()
+            if time.monotonic() - last_keepalive >= KEEPALIVE_INTERVAL:
+                self.publisher.keepalive()
+                last_keepalive = time.monotonic()
             time.sleep(1)
 
     def _run_parser_in_thread(self, resource):
@@ -127,8 +436,73 @@ def json_serializer(obj):
     raise TypeError(f"Type {type(obj)} not serializable")
 
 
+def create_redis_client(conf: dict) -> redis.StrictRedis:
+    return redis.StrictRedis(
+        host=conf["redis"]["host"],
+        port=conf["redis"]["port"],
+        db=conf["redis"].get("db", 0),
+        decode_responses=True
+    )
+
+
+def print_dedupe_stats(conf: dict):
+    redis_client = create_redis_client(conf)
+    report = memory_report(redis_client, [
+        NewsStore.FINGERPRINT_PREFIX,
+        NewsStore.PAYLOAD_PREFIX,
+        SeenUrlIndex(redis_client).prefix,
+    ])
+    for prefix, stats in report.items():
+        print(f"{prefix}*: ключей {stats['keys']}, ~{stats['estimated_bytes'] / 1024:.1f} КБ")
+    print(f"Redis used_memory: {redis_client.info('memory')['used_memory_human']}")
+
+
+def print_throttle_state(conf: dict):
+    states = RedisStateStore(create_redis_client(conf), "backpressure").all()
+    if not states:
+        print("Состояние обратного давления ещё не записано")
+    for queue, state in states.items():
+        checked_at = datetime.fromtimestamp(state["checked_at"]).isoformat(timespec="seconds")
+        print(f"{queue}: {state['state']}, сообщений {state['depth']}, потребителей {state['consumers']}, "
+              f"интервалы x{state['stretch']:.1f}, проверено {checked_at}")
+
+
+def reextract_archive(conf: dict, output: str, workers: int = None):
+    archive = HtmlArchive(conf["parser"].get("archive", {}).get("path", "data/html_archive"))
+    news_parsers = {name: resource.get("news_parser") for name, resource in conf["parser"]["resources"].items()}
+    extract = functools.partial(reextract_path, news_parsers=news_parsers)
+
+    started, total, extracted = time.monotonic(), 0, 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor, \
+            open(output, "w", encoding="utf-8") as file:
+        for news in executor.map(extract, archive.paths(), chunksize=16):
+            total += 1
+            if news:
+                extracted += 1
+                file.write(json.dumps(news, ensure_ascii=False, default=json_serializer) + "\n")
+    elapsed = time.monotonic() - started
+    print(f"Извлечено {extracted} из {total} статей за {elapsed:.1f} с ({total / max(elapsed, 1e-9):.1f} статей/с)")
+
+
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Парсер новостей")
+    commands = arg_parser.add_subparsers(dest="command")
+    commands.add_parser("run", help="запустить сбор новостей (по умолчанию)")
+    commands.add_parser("dedupe-stats", help="показать размер хранилища дедупликации в Redis")
+    commands.add_parser("throttle-state", help="показать состояние обратного давления от очереди")
+    reextract = commands.add_parser("reextract", help="повторно извлечь статьи из локального HTML-архива")
+    reextract.add_argument("--output", default="data/reextracted.jsonl")
+    reextract.add_argument("--workers", type=int, default=None)
+    args = arg_parser.parse_args()
+
     with open("config.json", 'r', encoding='utf-8') as file:
         conf = json.load(file)
-    
-    RunParser(conf).run()
+
+    if args.command == "dedupe-stats":
+        print_dedupe_stats(conf)
+    elif args.command == "throttle-state":
+        print_throttle_state(conf)
+    elif args.command == "reextract":
+        reextract_archive(conf, args.output, args.workers)
+    else:
+        RunParser(conf).run()
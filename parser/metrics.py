@@ -0,0 +1,86 @@
+from prometheus_client import CollectorRegistry, Counter, Enum, Gauge, Histogram, start_http_server
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+class IngestionMetrics:
+    """Метрики ингеста по ресурсам в формате Prometheus.
+
+    Все метрики живут в собственном реестре, serve() отдаёт их по HTTP
+    (`/metrics`). Этапы: загрузка ленты/страницы/статьи, извлечение текста,
+    дедупликация, публикация в RabbitMQ.
+    """
+
+    def __init__(self, registry: CollectorRegistry = None):
+        self.registry = registry or CollectorRegistry()
+        self.fetch_seconds = Histogram(
+            "parser_fetch_seconds", "Время HTTP-загрузки",
+            ["resource", "kind"], buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.fetched_bytes = Counter(
+            "parser_fetched_bytes", "Скачано байт (после распаковки)",
+            ["resource", "kind"], registry=self.registry,
+        )
+        self.entries_seen = Counter(
+            "parser_feed_entries", "Записей в загруженных лентах и списках ссылок",
+            ["resource"], registry=self.registry,
+        )
+        self.articles_fetched = Counter(
+            "parser_articles_fetched", "Успешно скачанных статей",
+            ["resource"], registry=self.registry,
+        )
+        self.extraction_seconds = Histogram(
+            "parser_extraction_seconds", "Время извлечения статьи из HTML",
+            ["resource"], buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.dedupe_skips = Counter(
+            "parser_dedupe_skips", "Отброшено как уже известное",
+            ["resource", "stage"], registry=self.registry,
+        )
+        self.news_published = Counter(
+            "parser_news_published", "Новостей записано в Redis и отправлено в RabbitMQ",
+            ["resource"], registry=self.registry,
+        )
+        self.publish_seconds = Histogram(
+            "parser_publish_seconds", "Время публикации пачки ключей в RabbitMQ с подтверждением",
+            ["resource"], buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.errors = Counter(
+            "parser_errors", "Ошибки по этапам",
+            ["resource", "stage"], registry=self.registry,
+        )
+        self.feed_cache = Gauge(
+            "parser_feed_cache", "Счётчики кеша лент с момента запуска",
+            ["resource", "result"], registry=self.registry,
+        )
+        self.queue_depth = Gauge(
+            "parser_queue_depth", "Сообщений в очереди сырых новостей при последней проверке",
+            registry=self.registry,
+        )
+        self.queue_consumers = Gauge(
+            "parser_queue_consumers", "Потребителей очереди сырых новостей",
+            registry=self.registry,
+        )
+        self.interval_stretch = Gauge(
+            "parser_interval_stretch", "Во сколько раз растянуты интервалы опроса обратным давлением",
+            registry=self.registry,
+        )
+        self.throttle_state = Enum(
+            "parser_throttle_state", "Состояние обратного давления",
+            states=["normal", "throttled", "paused"], registry=self.registry,
+        )
+
+    def serve(self, port: int, addr: str = "0.0.0.0"):
+        start_http_server(port, addr=addr, registry=self.registry)
+
+    def observe_feed_cache(self, resource: str, counters: dict):
+        for result, value in counters.items():
+            self.feed_cache.labels(resource, result).set(value)
+
+    def observe_backpressure(self, state: dict):
+        if state.get("depth") is None:
+            return
+        self.queue_depth.set(state["depth"])
+        self.queue_consumers.set(state["consumers"])
+        self.interval_stretch.set(state["stretch"])
+        self.throttle_state.state(state["state"])
@@ -0,0 +1,75 @@
+import re
+import json
+import random
+import hashlib
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+class NearDuplicateIndex:
+    """Поиск почти одинаковых новостей (одна заметка агентства у разных изданий).
+
+    Текст режется на шинглы из shingle слов, по ним считается MinHash-подпись
+    из num_perm хешей. Подпись делится на bands полос, и каждая полоса —
+    корзина LSH в Redis. Кандидаты из общих корзин сравниваются по оценке
+    Жаккара. Корзины и подписи живут window секунд.
+    """
+
+    def __init__(self, redis_client, window: int, threshold: float = 0.6, num_perm: int = 64, bands: int = 16,
+                 shingle: int = 3, prefix: str = "parser:lsh:"):
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+        self.redis_client = redis_client
+        self.window = window
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        self.prefix = prefix
+        generator = random.Random(1)
+        self._permutations = [
+            (generator.randint(1, MERSENNE_PRIME - 1), generator.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, text: str) -> list[int]:
+        words = re.findall(r"\w+", text.lower())
+        shingles = {" ".join(words[i:i + self.shingle]) for i in range(max(1, len(words) - self.shingle + 1))}
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles]
+        return [min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes) for a, b in self._permutations]
+
+    def find_or_add(self, key: str, text: str) -> str | None:
+        """Возвращает ключ похожей новости из окна либо добавляет эту новость в индекс."""
+        signature = self.signature(text)
+        band_keys = [self._band_key(band, signature[band * self.rows:(band + 1) * self.rows])
+                     for band in range(self.bands)]
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for band_key in band_keys:
+            pipe.smembers(band_key)
+        candidates = set().union(*pipe.execute()) - {key}
+
+        if candidates:
+            candidates = sorted(candidates)
+            stored = self.redis_client.mget([self.prefix + "sig:" + candidate for candidate in candidates])
+            for candidate, raw in zip(candidates, stored):
+                if raw and self.similarity(signature, json.loads(raw)) >= self.threshold:
+                    return candidate
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for band_key in band_keys:
+            pipe.sadd(band_key, key)
+            pipe.expire(band_key, self.window)
+        pipe.set(self.prefix + "sig:" + key, json.dumps(signature), ex=self.window)
+        pipe.execute()
+        return None
+
+    @staticmethod
+    def similarity(first: list[int], second: list[int]) -> float:
+        return sum(a == b for a, b in zip(first, second)) / len(first)
+
+    def _band_key(self, band: int, values: list[int]) -> str:
+        digest = hashlib.blake2b(repr(values).encode(), digest_size=8).hexdigest()
+        return f"{self.prefix}{band}:{digest}"
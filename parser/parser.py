@@ -1,21 +1,50 @@
-import re
-import random
 import logging
 import asyncio
 import feedparser
-from newspaper import Article
-from datetime import datetime
-from telethon import TelegramClient
+import lxml.html
+from datetime import datetime, timezone
+from concurrent.futures import Executor
+from telethon import TelegramClient, events
+from fetcher import Fetcher, FetchAborted, HTML_TYPES
+from feed_cache import FeedCache
+from dedupe import SeenUrlIndex, entry_url
+from rate_limiter import DomainRateLimiter
+from extraction import extract_article
+from checkpoint import FeedCheckpoints
+from extractors import URL_PARSERS
+from archive import HtmlArchive
+from state import RedisStateStore
+from metrics import IngestionMetrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Parser:
-    def __init__(self, headers: dict = None, resources: dict = None):
+    def __init__(self, headers: dict = None, resources: dict = None, fetcher: Fetcher = None,
+                 feed_cache: FeedCache = None, seen_index: SeenUrlIndex = None,
+                 rate_limiter: DomainRateLimiter = None, extraction_executor: Executor = None,
+                 checkpoints: FeedCheckpoints = None, max_article_bytes: int = None,
+                 article_deadline: float = None, archive: HtmlArchive = None, tg_parser: 'TgParser' = None,
+                 metrics: IngestionMetrics = None):
         self.headers = headers or {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         self.resources = resources or {}
+        self.fetcher = fetcher or Fetcher(headers=self.headers)
+        self.feed_cache = feed_cache
+        self.seen_index = seen_index
+        self.rate_limiter = rate_limiter or DomainRateLimiter()
+        self.extraction_executor = extraction_executor
+        self.checkpoints = checkpoints
+        self.max_article_bytes = max_article_bytes
+        self.article_deadline = article_deadline
+        self.archive = archive
+        self.tg_parser = tg_parser
+        self.metrics = metrics or IngestionMetrics()
+        for config in self.resources.values():
+            for key in ('url', 'rss'):
+                if config.get(key):
+                    self.rate_limiter.configure(config[key], config.get('rate_limit'))
 
     async def get_news(self, resource: str, limit: int = 10) -> list[dict]:
         logger.info(f"Starting news parsing for resource: {resource}, limit: {limit}")
@@ -25,45 +54,201 @@ class Parser:
 
         config = self.resources[resource]
         news_data = []
+        # каждый запуск готовит состояние заново: остаток прошлого неудачного запуска не должен быть зафиксирован
+        self.discard(resource)
 
         try:
             if 'rss' in config:
                 logger.debug(f"Parsing RSS for {resource}")
                 news_data = await self._parse_rss_news(resource, limit)
+            elif 'telegram' in config:
+                if self.tg_parser is None:
+                    raise ValueError(f"get_news:Для {resource} не настроен клиент Telegram")
+                logger.debug(f"Fetching Telegram channel for {resource}")
+                news_data = await self.tg_parser.get_messages(config['telegram'], limit)
+            elif config.get('url_parser'):
+                logger.debug(f"Parsing listing page for {resource}")
+                news_data = await self._parse_listing_news(resource, limit)
             else:
-                logger.error(f"No RSS feed specified for {resource}")
-                raise ValueError(f"get_news:Для {resource} не указан RSS")
+                logger.error(f"No RSS feed or url_parser specified for {resource}")
+                raise ValueError(f"get_news:Для {resource} не указан RSS или url_parser")
             return news_data[:limit]
 
         except Exception as e:
             logger.error(f"Failed to parse news for {resource}: {str(e)}", exc_info=True)
+            self.discard(resource)
             raise Exception(f"get_news:{resource}: {e}")
 
+    def commit(self, resource: str):
+        """Фиксирует состояние ресурса (валидаторы, отметку ленты, min_id канала) после записи новостей."""
+        if self.feed_cache:
+            self.feed_cache.commit(resource)
+        if self.checkpoints:
+            self.checkpoints.commit(resource)
+        config = self.resources.get(resource, {})
+        if self.tg_parser and 'telegram' in config:
+            self.tg_parser.commit(config['telegram'])
+
+    def discard(self, resource: str):
+        """Сбрасывает состояние ресурса, подготовленное запуском, новости которого не записаны."""
+        if self.feed_cache:
+            self.feed_cache.discard(resource)
+        if self.checkpoints:
+            self.checkpoints.discard(resource)
+        config = self.resources.get(resource, {})
+        if self.tg_parser and 'telegram' in config:
+            self.tg_parser.discard(config['telegram'])
+
     async def _parse_rss_news(self, resource: str, limit: int) -> list[dict]:
         config = self.resources[resource]
         logger.debug(f"Fetching RSS feed: {config['rss']}")
-        feed = feedparser.parse(config['rss'], request_headers=self.headers)
+        # обращения к Redis синхронные, поэтому уводим их с event loop, чтобы задержка Redis не стопорила все ленты
+        request_headers = await asyncio.to_thread(self.feed_cache.request_headers, resource) if self.feed_cache else None
+        async with self.rate_limiter.limit(config['rss']):
+            with self.metrics.fetch_seconds.labels(resource, 'feed').time():
+                response = await self.fetcher.fetch(config['rss'], headers=request_headers)
+        self.metrics.fetched_bytes.labels(resource, 'feed').inc(len(response.body))
+        if self.feed_cache and not await asyncio.to_thread(self.feed_cache.is_modified, resource, response):
+            return []
+        if not response.ok:
+            raise ValueError(f"_parse_rss_news:{resource}: RSS вернул статус {response.status}")
+        feed = feedparser.parse(response.body, response_headers=response.headers)
         
+        entries = {entry_url(entry): entry for entry in feed.entries if entry_url(entry)}
+        urls = list(entries)
+        self.metrics.entries_seen.labels(resource).inc(len(entries))
+        if self.checkpoints:
+            urls = await asyncio.to_thread(self.checkpoints.new_urls, resource, entries)
+            logger.info(f"{len(urls)} of {len(entries)} RSS entries for {resource} are newer than the checkpoint")
+            self.metrics.dedupe_skips.labels(resource, 'checkpoint').inc(len(entries) - len(urls))
+        if self.seen_index:
+            unseen = await asyncio.to_thread(self.seen_index.filter_unseen, urls)
+            logger.info(f"{len(urls) - len(unseen)} of {len(urls)} RSS entries for {resource} are already known")
+            self.metrics.dedupe_skips.labels(resource, 'seen_url').inc(len(urls) - len(unseen))
+            urls = unseen
+
+        # при отметке берём самые старые из новых записей, остальные догоним следующим опросом
+        selected = urls[-limit:] if self.checkpoints else urls[:limit]
+
         tasks = []
-        for entry in feed.entries[:limit]:
-            logger.debug(f"Queuing article parsing for URL: {entry.link}")
-            tasks.append(self._parse_news_article(entry.link))
-            await asyncio.sleep(random.uniform(1, 3))
+        for url in selected:
+            logger.debug(f"Queuing article parsing for URL: {url}")
+            tasks.append(self._parse_entry(url, entries[url], resource))
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         news_data = [{**result, "sourse": resource, "sourse_type": "web"} for result in results if isinstance(result, dict)]
-        logger.info(f"Parsed {len(news_data)} valid articles from {len(tasks)} RSS entries for {resource}")        
+        logger.info(f"Parsed {len(news_data)} valid articles from {len(tasks)} RSS entries for {resource}")
+        # неудачные записи (таймаут, 5xx, ошибка извлечения) должны попасть в следующий опрос
+        failed = {url for url, result in zip(selected, results) if not isinstance(result, dict)}
+        if self.checkpoints:
+            self.checkpoints.stage(resource, {url: entries[url] for url in selected}, failed)
+        if self.feed_cache and not failed and \
+                (len(urls) <= limit or (self.seen_index is None and self.checkpoints is None)):
+            # если новых записей больше limit, ленту нужно разобрать повторно
+            self.feed_cache.stage(resource, response)
         return news_data
 
-    async def _parse_news_article(self, url: str):
+    async def _parse_entry(self, url: str, entry, resource: str):
+        config = self.resources[resource]
+        if config.get('extraction') == 'feed':
+            try:
+                news = self._news_from_entry(url, entry, config)
+            except Exception as e:
+                logger.warning(f"Failed to build article {url} from feed entry: {e}")
+                news = None
+            if news:
+                logger.debug(f"Built article {url} from feed entry")
+                return news
+            logger.debug(f"Feed entry {url} has no usable body, downloading article")
+        return await self._parse_news_article(url, resource)
+
+    async def _parse_listing_news(self, resource: str, limit: int) -> list[dict]:
+        config = self.resources[resource]
+        link_parser = URL_PARSERS.get(config['url_parser'])
+        if link_parser is None:
+            raise ValueError(f"_parse_listing_news:{resource}: неизвестный url_parser {config['url_parser']}")
+
+        async with self.rate_limiter.limit(config['url']):
+            with self.metrics.fetch_seconds.labels(resource, 'listing').time():
+                response = await self.fetcher.fetch(config['url'], accept_types=HTML_TYPES)
+        self.metrics.fetched_bytes.labels(resource, 'listing').inc(len(response.body))
+        if not response.ok:
+            raise ValueError(f"_parse_listing_news:{resource}: страница вернула статус {response.status}")
+
+        urls = link_parser.extract(response.body, response.url, response.charset)
+        self.metrics.entries_seen.labels(resource).inc(len(urls))
+        if self.seen_index:
+            unseen = await asyncio.to_thread(self.seen_index.filter_unseen, urls)
+            self.metrics.dedupe_skips.labels(resource, 'seen_url').inc(len(urls) - len(unseen))
+            urls = unseen
+
+        tasks = [self._parse_news_article(url, resource) for url in urls[:limit]]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        news_data = [{**result, "sourse": resource, "sourse_type": "web"} for result in results if isinstance(result, dict)]
+        logger.info(f"Parsed {len(news_data)} valid articles from {len(tasks)} listing links for {resource}")
+        return news_data
+
+    def _news_from_entry(self, url: str, entry, config: dict):
+        candidates = [entry.get(config['feed_text_field'], '')] if config.get('feed_text_field') else []
+        candidates += [content.get('value', '') for content in entry.get('content', [])]
+        candidates.append(entry.get('summary', ''))
+        text = max((self._html_to_text(candidate) for candidate in candidates), key=len)
+
+        header = (entry.get('title') or '').strip()
+        if not header or len(text) < config.get('min_text_length', 300):
+            return None
+
+        published = entry.get('published_parsed') or entry.get('updated_parsed')
+        return {
+            'header': header,
+            'text': text,
+            'date': datetime(*published[:6], tzinfo=timezone.utc) if published else datetime.now(),
+            'url': url
+        }
+
+    @staticmethod
+    def _html_to_text(value: str) -> str:
+        if not value or not value.strip():
+            return ''
+        if '<' not in value:
+            return value.strip()
+        document = lxml.html.fromstring(value)
+        for element in document.iter('p', 'br', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'blockquote'):
+            element.tail = '\n' + (element.tail or '')
+        lines = (line.strip() for line in document.text_content().splitlines())
+        return '\n'.join(line for line in lines if line)
+
+    async def _parse_news_article(self, url: str, resource: str = None):
         logger.debug(f"Parsing article: {url}")
         try:
-            loop = asyncio.get_event_loop()
-            article_data = await loop.run_in_executor(None, self._parse_article_sync, url)
+            async with self.rate_limiter.limit(url):
+                with self.metrics.fetch_seconds.labels(resource, 'article').time():
+                    response = await self.fetcher.fetch(
+                        url,
+                        max_bytes=self.max_article_bytes,
+                        deadline=self.article_deadline,
+                        accept_types=HTML_TYPES,
+                    )
+            self.metrics.fetched_bytes.labels(resource, 'article').inc(len(response.body))
+            if not response.ok:
+                logger.warning(f"Article {url} returned status {response.status}")
+                self.metrics.errors.labels(resource, 'article_status').inc()
+                return None
+            self.metrics.articles_fetched.labels(resource).inc()
+
+            loop = asyncio.get_running_loop()
+            if self.archive:
+                await loop.run_in_executor(None, self.archive.put, url, response.body, resource, response.charset)
+            news_parser = self.resources.get(resource, {}).get('news_parser')
+            with self.metrics.extraction_seconds.labels(resource).time():
+                article_data = await loop.run_in_executor(
+                    self.extraction_executor, extract_article, url, response.body, news_parser, response.charset
+                )
             
             if not article_data or not article_data.get('header'):
                 logger.warning(f"No valid data parsed for article: {url}")
+                self.metrics.errors.labels(resource, 'extraction').inc()
                 return None
             logger.debug(f"Successfully parsed article: {url}")
             return {
@@ -73,131 +258,93 @@ class Parser:
                 'url': url
             }
 
+        except FetchAborted as e:
+            logger.warning(f"Article download aborted: {e}")
+            self.metrics.errors.labels(resource, 'article_aborted').inc()
+            return None
         except Exception as e:
             logger.error(f"Error parsing article {url}: {str(e)}", exc_info=True)
+            self.metrics.errors.labels(resource, 'article').inc()
             return None
 
-    def _parse_article_sync(self, url: str):
-        logger.debug(f"Synchronous parsing of article: {url}")
-        try:
-            article = Article(url)
-            article.download()
-            article.parse()
+class TgParser:
+    """Telegram-каналы как ресурсы парсера.
 
-            if 'Доступ к чату заблокирован' in article.html:
-                logger.error("Block detected for URL %s: Chat access blocked", url)
-                return None
-            
-            if not article.title or not article.text:
-                logger.warning(f"Article {url} has no title or text")
-                return None
+    Один постоянный клиент Telethon живёт на event loop ингеста (start/close),
+    переподключается сам. Для каждого канала хранится min_id последнего
+    записанного сообщения, поэтому опрос забирает только новые сообщения.
+    """
 
-            publish_date = self._extract_publication_date(article, url)
-            logger.debug(f"Extracted publication date {publish_date} for article {url}")
-            return {
-                'header': article.title,
-                'text': article.text,
-                'date': publish_date
-            }
+    def __init__(self, api_id: int, api_hash: str, phone: str, session: str = 'session',
+                 state: RedisStateStore = None):
+        self.client = TelegramClient(session, api_id, api_hash)
+        self.phone = phone
+        self.state = state
+        self._pending = {}
 
-        except Exception as e:
-            logger.error(f"Error in synchronous parsing of {url}: {str(e)}", exc_info=True)
-            return None
+    async def start(self):
+        await self.client.start(phone=self.phone)
+        logger.info("Telegram client connected")
 
-    def _extract_publication_date(self, article, url: str) -> datetime:
-        if article.publish_date:
-            return article.publish_date
-        
-        meta_date = self._extract_date_from_meta(article)
-        if meta_date:
-            return meta_date
-        
-        url_date = self._extract_date_from_url(url)
-        if url_date:
-            return url_date
-        
-        return datetime.now()
+    async def close(self):
+        await self.client.disconnect()
 
-    def _extract_date_from_meta(self, article):
-        try:
-            if hasattr(article, 'meta_data') and article.meta_data:
-                meta = article.meta_data
-                date_tags = [
-                    'pubdate', 'publish_date', 'article:published_time', 
-                    'date', 'og:published_time', 'publication_date'
-                ]
-                
-                for tag in date_tags:
-                    if tag in meta:
-                        date_str = meta[tag]
-                        parsed_date = self._parse_date_string(date_str)
-                        if parsed_date:
-                            return parsed_date
-        except Exception:
-            pass
-        return None
-
-    def _extract_date_from_url(self, url: str):
-        try:
-            patterns = [
-                r'/(\d{4})/(\d{2})/(\d{2})/',
-                r'/(\d{4})-(\d{2})-(\d{2})/',
-                r'/(\d{2})\.(\d{2})\.(\d{4})/',
-                r'_(\d{4})(\d{2})(\d{2})',
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    groups = match.groups()
-                    if len(groups) == 3:
-                        year, month, day = map(int, groups)
-                        return datetime(year, month, day)
-        except Exception:
-            pass
-        return None
-
-    def _parse_date_string(self, date_str: str):
-        if not date_str:
-            return None
-            
-        formats = [
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S',
-            '%Y-%m-%dT%H:%M:%SZ',
-            '%d.%m.%Y %H:%M',
-            '%Y-%m-%d',
-            '%d/%m/%Y',
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        return None
+    async def get_messages(self, channel_username: str, limit: int = 10) -> list[dict]:
+        min_id = (await asyncio.to_thread(self.state.get, channel_username)).get('min_id', 0) if self.state else 0
+        if min_id:
+            # от старых к новым: min_id сдвигается только по реально полученным сообщениям,
+            # остальные заберёт следующий опрос
+            messages = self.client.iter_messages(channel_username, limit=limit, min_id=min_id, reverse=True)
+        else:
+            # первый опрос канала: с reverse Telethon начал бы с самого старого сообщения и
+            # проигрывал бы всю историю, поэтому отметку ставим по последним limit сообщениям
+            messages = self.client.iter_messages(channel_username, limit=limit)
+        messages_data = []
+        async for message in messages:
+            self.stage(channel_username, message.id)
+            if message.text:
+                messages_data.append(self._message_to_news(channel_username, message))
+        if not min_id:
+            messages_data.reverse()
+        logger.info(f"Fetched {len(messages_data)} new messages from {channel_username} (min_id={min_id})")
+        return messages_data
 
-class TgParser:
-    def __init__(self, api_id: int, api_hash: str, phone: str):
-        self.client = TelegramClient('session', api_id, api_hash)
-        self.phone = phone
+    def subscribe(self, channels: dict, handler):
+        """Подписка на новые сообщения каналов вместо ожидания следующего опроса.
 
-    def get_messages(self, channel_username: str, limit: int = 10):
-        async def _wrapper():
-            await self.client.start(phone=self.phone)
-            
-            messages_data = []
-            async for message in self.client.iter_messages(channel_username, limit=limit):
-                if message.text:
-                    messages_data.append({
-                        'header': message.text[:100] + '...' if len(message.text) > 100 else message.text,
-                        'text': message.text,
-                        'date': message.date,
-                        'url': f"https://t.me/{channel_username.replace('@', '')}/{message.id}"
-                    })
-                    #TODO добавить нужные элементы
-            
-            await self.client.disconnect()
-            return messages_data
+        channels — {username канала: имя ресурса}, handler(resource, news) — корутина.
+        """
+        by_username = {username.lstrip('@').lower(): resource for username, resource in channels.items()}
 
-        return asyncio.run(_wrapper())
\ No newline at end of file
+        async def on_message(event):
+            chat = await event.get_chat()
+            username = (getattr(chat, 'username', None) or '').lower()
+            if username not in by_username or not event.message.text:
+                return
+            channel_username = f"@{username}"
+            # min_id не трогаем: между опросами могли быть сообщения, которых событие не покрыло
+            await handler(by_username[username], [self._message_to_news(channel_username, event.message)])
+
+        self.client.add_event_handler(on_message, events.NewMessage(chats=list(channels)))
+
+    def stage(self, channel_username: str, message_id: int):
+        self._pending[channel_username] = max(self._pending.get(channel_username, 0), message_id)
+
+    def discard(self, channel_username: str):
+        self._pending.pop(channel_username, None)
+
+    def commit(self, channel_username: str):
+        message_id = self._pending.pop(channel_username, None)
+        if not message_id or not self.state:
+            return
+        state = self.state.get(channel_username)
+        self.state.set(channel_username, {**state, 'min_id': max(state.get('min_id', 0), message_id)})
+
+    @staticmethod
+    def _message_to_news(channel_username: str, message) -> dict:
+        return {
+            'header': message.text[:100] + '...' if len(message.text) > 100 else message.text,
+            'text': message.text,
+            'date': message.date,
+            'url': f"https://t.me/{channel_username.replace('@', '')}/{message.id}"
+        }
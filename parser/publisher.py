@@ -0,0 +1,130 @@
+import time
+import logging
+import threading
+import pika
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERRORS = (
+    pika.exceptions.AMQPConnectionError,
+    pika.exceptions.AMQPChannelError,
+    pika.exceptions.StreamLostError,
+    pika.exceptions.ChannelWrongStateError,
+)
+
+
+class PublishError(Exception):
+    """Пачку не удалось отправить целиком; confirmed первых сообщений брокер подтвердил."""
+
+    def __init__(self, message: str, confirmed: int):
+        super().__init__(message)
+        self.confirmed = confirmed
+
+
+class RabbitPublisher:
+    """Долгоживущий потокобезопасный издатель в очередь сырых новостей.
+
+    Одно соединение и канал на процесс, канал в режиме publisher confirms.
+    BlockingChannel ждёт подтверждения каждого basic_publish отдельно, так
+    что пачка — это последовательная отправка по общему каналу, а не одно
+    ожидание подтверждений на всю пачку. При потере соединения
+    переподключается и досылает неподтверждённые сообщения пачки.
+    """
+
+    def __init__(self, conf: dict, retries: int = 3, retry_delay: float = 2):
+        self.conf = conf
+        self.queue = conf["queue"]
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+
+    def connect(self):
+        with self._lock:
+            self._ensure_channel()
+
+    def publish(self, bodies: list[str]) -> int:
+        """Отправляет bodies по порядку и возвращает число подтверждённых сообщений.
+
+        Если отправить все не удалось, бросает PublishError с числом
+        подтверждённых к этому моменту.
+        """
+        if not bodies:
+            return 0
+        with self._lock:
+            sent = 0
+            for attempt in range(1, self.retries + 1):
+                try:
+                    self._ensure_channel()
+                    for body in bodies[sent:]:
+                        self._channel.basic_publish(
+                            exchange="",
+                            routing_key=self.queue,
+                            body=body,
+                            properties=pika.BasicProperties(delivery_mode=2),
+                        )
+                        sent += 1
+                    return sent
+                except CONNECTION_ERRORS as e:
+                    logger.warning(f"RabbitMQ publish failed (attempt {attempt}/{self.retries}): {e}")
+                    self._reset()
+                    if attempt == self.retries:
+                        raise PublishError(f"RabbitMQ недоступен: {e}", sent) from e
+                    time.sleep(self.retry_delay)
+                except Exception as e:
+                    # например, брокер отклонил сообщение (NackError): подтверждены только первые sent
+                    raise PublishError(f"RabbitMQ не принял сообщение: {e}", sent) from e
+
+    def queue_depth(self) -> tuple[int, int]:
+        """Число сообщений и потребителей очереди (пассивный queue_declare)."""
+        with self._lock:
+            try:
+                self._ensure_channel()
+                result = self._channel.queue_declare(queue=self.queue, passive=True)
+            except CONNECTION_ERRORS:
+                self._reset()
+                raise
+            return result.method.message_count, result.method.consumer_count
+
+    def keepalive(self):
+        """Обрабатывает heartbeat-кадры, пока издатель простаивает между запусками."""
+        with self._lock:
+            if self._connection is None or self._connection.is_closed:
+                return
+            try:
+                self._connection.process_data_events(time_limit=0)
+            except CONNECTION_ERRORS as e:
+                logger.warning(f"RabbitMQ connection lost while idle: {e}")
+                self._reset()
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+    def _ensure_channel(self):
+        if self._channel is not None and self._channel.is_open and self._connection.is_open:
+            return
+        self._reset()
+        self._connection = pika.BlockingConnection(
+            pika.ConnectionParameters(
+                host=self.conf["host"],
+                port=self.conf.get("port", 5672),
+                credentials=pika.PlainCredentials(self.conf["user"], self.conf["password"]),
+                heartbeat=600,
+                blocked_connection_timeout=300,
+            )
+        )
+        self._channel = self._connection.channel()
+        self._channel.queue_declare(queue=self.queue, durable=True)
+        self._channel.confirm_delivery()
+        logger.info(f"Connected to RabbitMQ, publishing to '{self.queue}' with confirms")
+
+    def _reset(self):
+        if self._connection is not None and self._connection.is_open:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+        self._connection = None
+        self._channel = None
@@ -0,0 +1,74 @@
+import time
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Токен-бакет: rate запросов в секунду со всплеском до burst."""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд нужно подождать до его появления."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class DomainRateLimiter:
+    """Ограничение частоты и числа одновременных запросов к каждому хосту.
+
+    Лимиты берутся из rate_limit ресурса в config.json, иначе из общего
+    parser.rate_limit. Запросы к разным хостам друг друга не ждут.
+    """
+
+    def __init__(self, default: dict = None):
+        self.default = {"rps": 1.0, "burst": 1, "concurrency": 2, **(default or {})}
+        self._limits = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        # asyncio.Semaphore привязан к event loop, в потоковом режиме у каждого запуска свой loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def configure(self, url: str, limits: dict = None):
+        if limits:
+            self._limits[self.domain(url)] = {**self.default, **limits}
+
+    @staticmethod
+    def domain(url: str) -> str:
+        return urlsplit(url).netloc.lower().removeprefix("www.")
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        domain = self.domain(url)
+        limits = self._limits.get(domain, self.default)
+        async with self._semaphore(domain, limits["concurrency"]):
+            delay = self._bucket(domain, limits).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            yield
+
+    def _bucket(self, domain: str, limits: dict) -> TokenBucket:
+        with self._lock:
+            if domain not in self._buckets:
+                self._buckets[domain] = TokenBucket(limits["rps"], limits["burst"])
+            return self._buckets[domain]
+
+    def _semaphore(self, domain: str, concurrency: int) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            if domain not in semaphores:
+                semaphores[domain] = asyncio.Semaphore(concurrency)
+            return semaphores[domain]
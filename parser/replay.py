@@ -0,0 +1,119 @@
+import os
+import json
+import random
+import asyncio
+import socket
+import hashlib
+import logging
+import threading
+from urllib.parse import urlencode
+from aiohttp import web
+from fetcher import Fetcher, FetchResult
+
+logger = logging.getLogger(__name__)
+
+# заголовки, которые нельзя отдавать как есть: тело хранится уже распакованным
+SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class FixtureStore:
+    """Каталог с записанными ответами: index.json (url → статус, заголовки, файл) и bodies/."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as file:
+                self.index = json.load(file)
+
+    def save(self, url: str, result: FetchResult):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        os.makedirs(os.path.join(self.root, "bodies"), exist_ok=True)
+        with open(os.path.join(self.root, "bodies", name), "wb") as file:
+            file.write(result.body)
+        with self._lock:
+            self.index[url] = {"status": result.status, "headers": result.headers, "file": name}
+
+    def load(self, url: str) -> FetchResult | None:
+        record = self.index.get(url)
+        if record is None:
+            return None
+        with open(os.path.join(self.root, "bodies", record["file"]), "rb") as file:
+            return FetchResult(url=url, status=record["status"], headers=record["headers"], body=file.read())
+
+    def flush(self):
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(self.index_path, "w", encoding="utf-8") as file:
+            json.dump(self.index, file, ensure_ascii=False, indent=2)
+
+
+class RecordingFetcher(Fetcher):
+    """Fetcher, который сохраняет каждый ответ в FixtureStore."""
+
+    def __init__(self, fixtures: FixtureStore, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures = fixtures
+
+    async def fetch(self, url: str, headers: dict = None, **kwargs) -> FetchResult:
+        result = await super().fetch(url, headers, **kwargs)
+        self.fixtures.save(url, result)
+        return result
+
+
+class ReplayServer:
+    """Локальный HTTP-заменитель новостных сайтов: отдаёт записанные ответы
+    на GET /replay?url=<исходная ссылка> с задержкой latency ± jitter секунд."""
+
+    def __init__(self, fixtures: FixtureStore, latency: float = 0.0, jitter: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/replay"
+
+    async def start(self):
+        app = web.Application()
+        app.add_routes([web.get("/replay", self._handle)])
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+        logger.info(f"Replay server listening on {self.base_url} with {len(self.fixtures.index)} fixtures")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        result = self.fixtures.load(request.query.get("url", ""))
+        if result is None:
+            return web.Response(status=404)
+        headers = {k: v for k, v in result.headers.items() if k not in SKIP_HEADERS}
+        return web.Response(status=result.status, headers=headers, body=result.body)
+
+
+class ReplayFetcher(Fetcher):
+    """Fetcher, который перенаправляет все запросы на ReplayServer."""
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    async def fetch(self, url: str, headers: dict = None, **kwargs) -> FetchResult:
+        replay_url = f"{self.base_url}?{urlencode({'url': url})}"
+        result = await super().fetch(replay_url, headers, **kwargs)
+        result.url = url
+        return result
@@ -0,0 +1,66 @@
+import time
+import random
+import logging
+import threading
+from state import RedisStateStore
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveSchedule:
+    """Интервал опроса ресурса по наблюдаемой частоте новых новостей.
+
+    Для каждого ресурса хранится EWMA числа новых новостей в секунду.
+    Интервал выбирается так, чтобы за опрос приходило около target_items
+    новостей, и ограничен [min_interval, max_interval]. Пустой опрос
+    растягивает интервал в backoff раз. Состояние лежит в Redis и
+    переживает перезапуски.
+    """
+
+    def __init__(self, store: RedisStateStore, base_interval: float, min_interval: float, max_interval: float,
+                 target_items: float = 3, alpha: float = 0.3, backoff: float = 1.5, jitter: float = 0.1):
+        self.store = store
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_items = target_items
+        self.alpha = alpha
+        self.backoff = backoff
+        self.jitter = jitter
+        self._lock = threading.Lock()
+
+    def interval(self, resource: str) -> float:
+        interval = self.store.get(resource).get("interval", self.base_interval)
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def delay_until_due(self, resource: str) -> float:
+        """Сколько секунд осталось до следующего опроса с учётом прошлых запусков."""
+        state = self.store.get(resource)
+        if not state.get("last_poll"):
+            return 0.0
+        return max(0.0, state["last_poll"] + state["interval"] - time.time())
+
+    def observe(self, resource: str, new_items: int) -> float:
+        with self._lock:
+            now = time.time()
+            state = self.store.get(resource)
+            interval = state.get("interval", self.base_interval)
+            elapsed = now - state["last_poll"] if state.get("last_poll") else interval
+
+            sample = new_items / max(elapsed, 1.0)
+            rate = sample if state.get("rate") is None else self.alpha * sample + (1 - self.alpha) * state["rate"]
+
+            if new_items:
+                interval = self.target_items / rate if rate > 0 else interval
+            else:
+                interval *= self.backoff
+            interval = min(self.max_interval, max(self.min_interval, interval))
+
+            self.store.set(resource, {
+                "interval": interval,
+                "rate": rate,
+                "last_poll": now,
+                "last_change": now if new_items else state.get("last_change"),
+            })
+        logger.info(f"{resource}: {new_items} new items, rate {rate * 3600:.1f}/h, next poll in {interval / 60:.1f} min")
+        return interval
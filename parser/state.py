@@ -0,0 +1,23 @@
+import json
+
+
+class RedisStateStore:
+    """Постоянное состояние парсера по ресурсам.
+
+    Хранится в хеше Redis `parser:<namespace>`: поле — имя ресурса,
+    значение — JSON. Переживает перезапуски и общее для всех реплик.
+    """
+
+    def __init__(self, redis_client, namespace: str):
+        self.redis_client = redis_client
+        self.key = f"parser:{namespace}"
+
+    def get(self, resource: str) -> dict:
+        raw = self.redis_client.hget(self.key, resource)
+        return json.loads(raw) if raw else {}
+
+    def set(self, resource: str, value: dict):
+        self.redis_client.hset(self.key, resource, json.dumps(value, ensure_ascii=False))
+
+    def all(self) -> dict:
+        return {resource: json.loads(raw) for resource, raw in self.redis_client.hgetall(self.key).items()}